@@ -3,6 +3,8 @@ from flask_cors import CORS
 import os
 from werkzeug.exceptions import HTTPException
 from config import (
+    ALLOWED_EXTENSIONS,
+    MAX_FILE_SIZE,
     UPLOAD_FOLDER,
     PROCESSED_FOLDER,
     CORS_ORIGINS,
@@ -18,11 +20,16 @@ from routes.forecast import forecast_bp
 from routes.predict import predict_bp
 from routes.scatter import scatter_bp
 from routes.pareto import pareto_bp
+from utils.json_provider import FastJSONProvider
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 app.config["PROCESSED_FOLDER"] = PROCESSED_FOLDER
+app.config["ALLOWED_EXTENSIONS"] = ALLOWED_EXTENSIONS
+# Folga para os cabeçalhos do multipart; o limite exato do arquivo fica no upload.
+app.config["MAX_CONTENT_LENGTH"] = MAX_FILE_SIZE + 1024 * 1024
 
 CORS(
     app,
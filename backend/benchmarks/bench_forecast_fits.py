@@ -0,0 +1,63 @@
+"""Conta ajustes de modelo e mede o tempo por chamada de run_and_evaluate_forecasts.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_forecast_fits [repetições]
+"""
+
+import sys
+import time
+import warnings
+from collections import Counter
+import numpy as np
+import pandas as pd
+from statsmodels.genmod.generalized_linear_model import GLM
+from statsmodels.tsa.arima.model import ARIMA
+from utils.analysis import run_and_evaluate_forecasts
+
+fit_counts = Counter()
+
+
+def _counting(cls, name):
+    original = cls.fit
+
+    def fit(self, *args, **kwargs):
+        fit_counts[name] += 1
+        return original(self, *args, **kwargs)
+
+    cls.fit = fit
+
+
+def _build_frame(trend: float, rows: int = 20_000) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    offsets = rng.integers(0, 36 * 30, rows)
+    return pd.DataFrame(
+        {
+            "actual_date": pd.Timestamp("2021-01-01")
+            + pd.to_timedelta(offsets, unit="D"),
+            "delay_days": 5 + trend * offsets / 30 + rng.normal(0, 3, rows),
+        }
+    )
+
+
+def main(repeat: int = 20) -> None:
+    _counting(GLM, "GLM")
+    _counting(ARIMA, "ARIMA")
+    warnings.simplefilter("ignore")
+
+    for label, trend in [("sem tendência", 0.0), ("com tendência", 0.5)]:
+        df = _build_frame(trend)
+        fit_counts.clear()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = run_and_evaluate_forecasts(df)
+        elapsed = (time.perf_counter() - start) / repeat
+        print(
+            f"{label:>14}: modelo {result.get('model_used'):>4} | "
+            f"GLM.fit {fit_counts['GLM'] / repeat:.1f}/req | "
+            f"ARIMA.fit {fit_counts['ARIMA'] / repeat:.1f}/req | "
+            f"{elapsed * 1000:7.1f} ms/req | p-valores: {len(result.get('pvalues') or {})}"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
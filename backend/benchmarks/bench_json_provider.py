@@ -0,0 +1,77 @@
+"""Compara o provider JSON padrão do Flask com o FastJSONProvider.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_json_provider [linhas]
+"""
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from utils.json_provider import FastJSONProvider
+
+
+def _build_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    actual = pd.Timestamp("2021-01-01") + pd.to_timedelta(
+        rng.integers(0, 900, rows), unit="D"
+    )
+    return pd.DataFrame(
+        {
+            "actual_date": actual,
+            "estimated_date": actual
+            - pd.to_timedelta(rng.integers(-5, 20, rows), unit="D"),
+            "delay_days": rng.integers(-5, 20, rows).astype(float),
+            "Country": rng.choice(["Brasil", "Chile", "Peru", "México"], rows),
+            "Shipment Mode": rng.choice(["Air", "Truck", "Ocean", None], rows),
+            "Weight": rng.normal(100, 20, rows).round(1),
+        }
+    )
+
+
+def _time(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(rows: int = 200_000) -> None:
+    app = Flask(__name__)
+    providers = {"default": DefaultJSONProvider(app), "fast": FastJSONProvider(app)}
+    df = _build_frame(rows)
+
+    payloads = {
+        "scatter-data": {
+            "scatter": df.sample(min(rows, 1000), random_state=0).to_dict("records"),
+            "columns": list(df.columns),
+        },
+        "loadData": {
+            "data": df.assign(
+                actual_date=df["actual_date"].dt.strftime("%Y-%m-%d"),
+                estimated_date=df["estimated_date"].dt.strftime("%Y-%m-%d"),
+            )
+            .astype(object)
+            .where(df.notna(), None)
+            .to_dict("records")
+        },
+    }
+
+    for name, payload in payloads.items():
+        timings = {
+            label: _time(lambda provider=provider: provider.dumps(payload))
+            for label, provider in providers.items()
+        }
+        speedup = timings["default"] / timings["fast"]
+        print(
+            f"{name:>13}: default {timings['default'] * 1000:8.1f} ms | "
+            f"fast {timings['fast'] * 1000:8.1f} ms | {speedup:4.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
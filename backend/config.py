@@ -6,7 +6,51 @@ UPLOAD_FOLDER = BASE_DIR / "temp_files"
 PROCESSED_FOLDER = BASE_DIR / "processed_data"
 
 ALLOWED_EXTENSIONS = {"csv", "xlsx", "xls"}
-MAX_FILE_SIZE = 10 * 1024 * 1024
+MAX_FILE_SIZE = int(os.environ.get("MAX_FILE_SIZE", 512 * 1024 * 1024))
+# Upload gravado em disco em blocos; o início fica em memória para a prévia.
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+UPLOAD_HEAD_SIZE = 64 * 1024
+# CSV e planilhas viram parquet no upload; /loadData e /analyze não voltam a
+# decodificar o arquivo original.
+UPLOAD_CONVERT_TO_PARQUET = os.environ.get("UPLOAD_CONVERT_TO_PARQUET", "1") != "0"
+UPLOAD_CONVERT_CHUNK_ROWS = 100000
+
+PROCESSED_CACHE_MAX_BYTES = int(
+    os.environ.get("PROCESSED_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+)
+PROCESSED_CACHE_MAX_ENTRIES = 32
+PROCESSED_ROW_GROUP_SIZE = 16 * 1024
+
+FORECAST_CACHE_MAX_ENTRIES = 256
+FORECAST_CACHE_TTL = 60 * 60
+FORECAST_BATCH_WORKERS = int(
+    os.environ.get("FORECAST_BATCH_WORKERS", min(8, os.cpu_count() or 1))
+)
+FORECAST_BATCH_MAX_GROUPS = 200
+
+# Combinações (fator, valor, mês) por bloco do cubo de agregados do Pareto.
+CUBE_MAX_GROUP_ROWS = 100000
+
+# Análise cruzada do Pareto: colunas acima do limite de valores distintos são
+# omitidas; nas demais, o que passar do top N vira o grupo "Outros".
+PARETO_CROSS_MAX_CARDINALITY = int(os.environ.get("PARETO_CROSS_MAX_CARDINALITY", 500))
+PARETO_CROSS_TOP_N = int(os.environ.get("PARETO_CROSS_TOP_N", 20))
+PARETO_CROSS_WORKERS = min(4, os.cpu_count() or 1)
+
+# /predict em lote: limite de consultas por requisição e memória das máscaras
+# de filtro compartilhadas entre consultas com os mesmos fatores.
+PREDICT_BATCH_MAX_QUERIES = int(os.environ.get("PREDICT_BATCH_MAX_QUERIES", 50000))
+PREDICT_BATCH_MASK_CACHE_BYTES = 64 * 1024 * 1024
+# Índices de casos similares do /predict mantidos em memória entre requisições.
+PREDICTION_INDEX_CACHE_MAX_BYTES = int(
+    os.environ.get("PREDICTION_INDEX_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+)
+
+# Modo treinado do /predict (Random Forest por arquivo processado).
+PREDICTOR_N_ESTIMATORS = 50
+PREDICTOR_MAX_DEPTH = 12
+PREDICTOR_MAX_CATEGORIES = 1000
+PREDICTOR_TRAIN_MAX_ROWS = int(os.environ.get("PREDICTOR_TRAIN_MAX_ROWS", 200000))
 
 CORS_ORIGINS = [os.environ.get("FRONTEND_URL")]
 
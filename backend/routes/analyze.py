@@ -1,7 +1,22 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from utils.data_prep import prepare_data
-from utils.analyzer import analyze_data
-from utils.file_utils import save_processed_dataframe
+from utils.analyzer import analyze_data, get_cached_analysis
+from utils.analysis import forecast_cache_key, build_aggregate_cube
+from utils.model_training import schedule_model_training
+from utils.file_utils import (
+    save_processed_dataframe,
+    save_aggregate_cube,
+    load_aggregate_cube,
+    load_delivery_model,
+    load_processed_dataframe,
+    load_uploaded_dataframe,
+    get_processed_file_hash,
+    get_linked_result,
+    get_upload_hash,
+    has_processed_result,
+    link_processed_result,
+    processed_result_key,
+)
 
 analyze_bp = Blueprint("analyze", __name__, url_prefix="/api")
 
@@ -17,42 +32,97 @@ def analyze_route():
         columns_info = payload.get("columns")
         file_id = payload.get("fileId")
 
-        if not dataset or not columns_info or not file_id:
+        if not columns_info or not file_id:
             return (
                 jsonify(
                     {
-                        "error": "Payload incompleto: dataset, informações das colunas ou fileId ausentes"
+                        "error": "Payload incompleto: informações das colunas ou fileId ausentes"
                     }
                 ),
                 400,
             )
 
-        try:
-            df_prepared = prepare_data(dataset, columns_info)
-            if df_prepared.empty:
+        # Mesmo conteúdo enviado e mesmos papéis de coluna: o parquet processado,
+        # o cubo, o modelo e a análise já existem sob o mesmo id.
+        upload_hash = None if dataset else get_upload_hash(file_id)
+        result_key = (
+            processed_result_key(upload_hash, columns_info) if upload_hash else None
+        )
+        # Em qualquer erro depois de trocar o resultado, o fileId volta ao anterior.
+        previous_key = get_linked_result(file_id)
+        reuse = result_key is not None and has_processed_result(result_key)
+
+        if reuse:
+            link_error = link_processed_result(file_id, result_key)
+            if link_error:
+                return jsonify({"error": link_error}), 500
+            content_hash = get_processed_file_hash(file_id)
+            analysis_results = get_cached_analysis(forecast_cache_key(content_hash))
+            if analysis_results is not None:
+                return jsonify(analysis_results)
+            df_prepared, load_error = load_processed_dataframe(file_id)
+            if load_error:
+                link_processed_result(file_id, previous_key)
+                return jsonify({"error": load_error}), 500
+        else:
+            if not dataset:
+                mapped_columns = [c.get("name") for c in columns_info if c.get("role")]
+                dataset, load_error = load_uploaded_dataframe(file_id, mapped_columns)
+                if load_error:
+                    status_code = 404 if "não encontrado" in load_error else 500
+                    return jsonify({"error": load_error}), status_code
+
+            try:
+                df_prepared = prepare_data(dataset, columns_info)
+                if df_prepared.empty:
+                    return (
+                        jsonify(
+                            {
+                                "error": "Nenhum dado válido encontrado após a preparação."
+                            }
+                        ),
+                        400,
+                    )
+                _, save_error = save_processed_dataframe(
+                    df_prepared, file_id, result_key
+                )
+                if save_error:
+                    return jsonify({"error": save_error}), 500
+            except Exception as e:
                 return (
                     jsonify(
-                        {"error": "Nenhum dado válido encontrado após a preparação."}
+                        {
+                            "error": f"Erro na preparação dos dados para análise: {str(e)}"
+                        }
                     ),
-                    400,
+                    500,
                 )
-            _, save_error = save_processed_dataframe(df_prepared, file_id)
-            if save_error:
-                return jsonify({"error": save_error}), 500
-        except Exception as e:
-            return (
-                jsonify(
-                    {"error": f"Erro na preparação dos dados para análise: {str(e)}"}
-                ),
-                500,
-            )
 
         try:
-            analysis_results = analyze_data(df_prepared)
+            content_hash = get_processed_file_hash(file_id)
+            if not reuse or load_aggregate_cube(file_id) is None:
+                try:
+                    # Falhas no cubo só fazem o Pareto voltar a ler as linhas brutas.
+                    cube = build_aggregate_cube(df_prepared, content_hash)
+                    if cube is not None:
+                        save_aggregate_cube(cube, file_id)
+                except Exception:
+                    pass
+            analysis_results = analyze_data(
+                df_prepared,
+                forecast_cache_key(content_hash) if content_hash else None,
+            )
             if isinstance(analysis_results, dict) and "error" in analysis_results:
+                link_processed_result(file_id, previous_key)
                 return jsonify({"error": analysis_results["error"]}), 500
+            if content_hash and load_delivery_model(file_id) is None:
+                # Modelo do /predict em modo "model", treinado em segundo plano.
+                schedule_model_training(
+                    current_app._get_current_object(), file_id, content_hash
+                )
             return jsonify(analysis_results)
         except Exception as e:
+            link_processed_result(file_id, previous_key)
             return jsonify({"error": f"Erro na análise dos dados: {str(e)}"}), 500
 
     except Exception as e:
@@ -60,4 +130,3 @@ def analyze_route():
             jsonify({"error": f"Erro interno do servidor na rota /analyze: {str(e)}"}),
             500,
         )
-        
\ No newline at end of file
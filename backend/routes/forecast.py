@@ -3,138 +3,165 @@ import traceback
 import pandas as pd
 from werkzeug.utils import secure_filename
 import os
-from utils.analyzer import run_and_evaluate_forecasts
-from utils.file_utils import load_processed_dataframe
+from utils.analysis import (
+    run_and_evaluate_forecasts,
+    forecast_cache_key,
+    get_cached_forecast,
+    run_forecasts_batch,
+)
+from config import FORECAST_BATCH_MAX_GROUPS
+from utils.data_prep import factor_equals
+from utils.file_utils import load_processed_dataframe, get_processed_file_hash
 
 forecast_bp = Blueprint('forecast', __name__, url_prefix='/api')
 
-@forecast_bp.route('/forecast', methods=['GET'])
-def get_forecast_route():
-    try:
-        factor_col = request.args.get('factor_col')
-        factor_value = request.args.get('factor_value')
-        file_id = request.args.get('fileId')
+def _load_forecast_frame(file_id, factor_col, factor_value):
+    df, load_error = load_processed_dataframe(file_id)
+    if load_error:
+        status_code = 404 if "não encontrado" in load_error else 500
 
-        if not file_id:
-            return jsonify({'error': 'fileId não fornecido na requisição'}), 400
+        return None, (jsonify({'error': load_error}), status_code)
 
-        df, load_error = load_processed_dataframe(file_id)
-        if load_error:
-            status_code = 404 if "não encontrado" in load_error else 500
+    required_cols = ['actual_date', 'delay_days']
+    if not all(col in df.columns for col in required_cols):
+        missing = [col for col in required_cols if col not in df.columns]
 
-            return jsonify({'error': load_error}), status_code
+        return None, (jsonify({'error': f"Colunas essenciais ({', '.join(missing)}) não encontradas nos dados processados."}), 500)
 
-        required_cols = ['actual_date', 'delay_days']
-        if not all(col in df.columns for col in required_cols):
-            missing = [col for col in required_cols if col not in df.columns]
+    if not pd.api.types.is_datetime64_any_dtype(df['actual_date']):
 
-            return jsonify({'error': f"Colunas essenciais ({', '.join(missing)}) não encontradas nos dados processados."}), 500
+         try:
+             df['actual_date'] = pd.to_datetime(df['actual_date'], errors='coerce')
+             if df['actual_date'].isnull().all():
+                 raise ValueError("Conversion resulted in all NaNs")
 
-        if not pd.api.types.is_datetime64_any_dtype(df['actual_date']):
+         except Exception as date_err:
 
-             try:
-                 df['actual_date'] = pd.to_datetime(df['actual_date'], errors='coerce')
-                 if df['actual_date'].isnull().all():
-                     raise ValueError("Conversion resulted in all NaNs")
+             return None, (jsonify({'error': "Coluna 'actual_date' nos dados processados não está no formato de data correto e não pôde ser convertida."}), 500)
 
-             except Exception as date_err:
+    if not pd.api.types.is_numeric_dtype(df['delay_days']):
 
-                 return jsonify({'error': "Coluna 'actual_date' nos dados processados não está no formato de data correto e não pôde ser convertida."}), 500
+         df['delay_days'] = pd.to_numeric(df['delay_days'], errors='coerce')
+         if df['delay_days'].isnull().all():
 
-        if not pd.api.types.is_numeric_dtype(df['delay_days']):
+             return None, (jsonify({'error': "Coluna 'delay_days' nos dados processados não é numérica ou contém apenas valores inválidos."}), 500)
 
-             df['delay_days'] = pd.to_numeric(df['delay_days'], errors='coerce')
-             if df['delay_days'].isnull().all():
+         df.dropna(subset=['delay_days'], inplace=True)
+         if df.empty:
 
-                 return jsonify({'error': "Coluna 'delay_days' nos dados processados não é numérica ou contém apenas valores inválidos."}), 500
+             return None, (jsonify({'error': "Nenhum dado válido de 'delay_days' restante após conversão."}), 400)
 
-             df.dropna(subset=['delay_days'], inplace=True)
-             if df.empty:
+    if factor_col and factor_value:
+        if factor_col in df.columns:
 
-                 return jsonify({'error': "Nenhum dado válido de 'delay_days' restante após conversão."}), 400
+            original_rows = len(df)
+            try:
+                col_dtype = df[factor_col].dtype
+                if pd.api.types.is_numeric_dtype(col_dtype):
+                    factor_value_typed = pd.to_numeric(factor_value)
+                elif pd.api.types.is_datetime64_any_dtype(col_dtype):
+                     factor_value_typed = pd.to_datetime(factor_value)
+                elif pd.api.types.is_bool_dtype(col_dtype):
+                     factor_value_lower = str(factor_value).lower()
+                     if factor_value_lower in ['true', '1', 'yes']: factor_value_typed = True
+                     elif factor_value_lower in ['false', '0', 'no']: factor_value_typed = False
+                     else: raise ValueError("Invalid boolean value for filter")
+                else:
+                     factor_value_typed = str(factor_value)
 
-        if factor_col and factor_value:
-            if factor_col in df.columns:
+                df = df[factor_equals(df[factor_col], factor_value_typed)].copy()
 
-                original_rows = len(df)
-                try:
-                    col_dtype = df[factor_col].dtype
-                    if pd.api.types.is_numeric_dtype(col_dtype):
-                        factor_value_typed = pd.to_numeric(factor_value)
-                    elif pd.api.types.is_datetime64_any_dtype(col_dtype):
-                         factor_value_typed = pd.to_datetime(factor_value)
-                    elif pd.api.types.is_bool_dtype(col_dtype):
-                         factor_value_lower = str(factor_value).lower()
-                         if factor_value_lower in ['true', '1', 'yes']: factor_value_typed = True
-                         elif factor_value_lower in ['false', '0', 'no']: factor_value_typed = False
-                         else: raise ValueError("Invalid boolean value for filter")
-                    else:
-                         factor_value_typed = str(factor_value)
 
-                    df = df[df[factor_col] == factor_value_typed].copy()
+            except ValueError as e:
 
+                 return None, (jsonify({'error': f"Valor '{factor_value}' inválido para o tipo de dado ({col_dtype}) do fator '{factor_col}'."}), 400)
+            except Exception as e:
 
-                except ValueError as e:
+                 traceback.print_exc()
+                 return None, (jsonify({'error': f"Erro inesperado ao aplicar filtro: {e}"}), 500)
+        else:
 
-                     return jsonify({'error': f"Valor '{factor_value}' inválido para o tipo de dado ({col_dtype}) do fator '{factor_col}'."}), 400
-                except Exception as e:
+             return None, (jsonify({'error': f"Coluna de fator '{factor_col}' não encontrada nos dados processados."}), 400)
 
-                     traceback.print_exc()
-                     return jsonify({'error': f"Erro inesperado ao aplicar filtro: {e}"}), 500
-            else:
+    if df.empty:
+        filter_msg = f" para o filtro: {factor_col} = {factor_value}" if factor_col else ""
 
-                 return jsonify({'error': f"Coluna de fator '{factor_col}' não encontrada nos dados processados."}), 400
+        return None, (jsonify({'error': f"Nenhum dado encontrado{filter_msg}."}), 404)
 
-        if df.empty:
-            filter_msg = f" para o filtro: {factor_col} = {factor_value}" if factor_col else ""
+    return df, None
 
-            return jsonify({'error': f"Nenhum dado encontrado{filter_msg}."}), 404
 
-        forecast_results = run_and_evaluate_forecasts(df)
-
-        response_data = {
-            "historical": forecast_results.get('historical', []),
-            "forecast": [
-                {
-                    "date": item["date"],
-                    "predicted_delay": item["value"],
-                    "conf_int_lower": item.get("confidence_lower"),
-                    "conf_int_upper": item.get("confidence_upper")
-                } for item in forecast_results.get('forecast', [])
-            ],
-"model_details": {
-    "type": forecast_results.get('model_used', 'unknown'),
-    "aic": forecast_results.get('aic', None),
-    "bic": forecast_results.get('bic', None),
-    "order": forecast_results.get('order'),
-    "family": forecast_results.get('family'),
-    "link": forecast_results.get('link'),
-    "order_or_family": (
-        f"{forecast_results['order']}" if forecast_results.get('model_used') == 'ARMA' and forecast_results.get('order')
-        else f"GLM({'Gaussiana' if forecast_results.get('family') == 'Gaussian' else forecast_results.get('family')})"
-            if forecast_results.get('model_used') == 'GLM' and forecast_results.get('family')
-        else "N/A"
-    ),
-    "significant": not (
-        (forecast_results.get('model_used') == 'GLM' and "não significativas" in (forecast_results.get('warning') or '')) or
-        (forecast_results.get('model_used') == 'ARMA' and "autocorrelação" in (forecast_results.get('warning') or '')) or
-        (forecast_results.get('model_used', '').startswith('Mean Forecast')) or
-        (forecast_results.get('error') is not None)
-    ),
-    "pvalues": forecast_results.get('pvalues', {}),
-    "significance_desc": forecast_results.get('significance_desc'),
-    "confidence_level": forecast_results.get('confidence_level'),
-    "confidence_desc": forecast_results.get('confidence_desc'),
-},
-
-            "other_model_details": forecast_results.get('other_model_details'),
-            "message": (
-                forecast_results.get('error')
-                or forecast_results.get('warning')
-                or "Previsão gerada com sucesso."
+def _build_forecast_response(forecast_results):
+    return {
+        "historical": forecast_results.get('historical', []),
+        "forecast": [
+            {
+                "date": item["date"],
+                "predicted_delay": item["value"],
+                "conf_int_lower": item.get("confidence_lower"),
+                "conf_int_upper": item.get("confidence_upper")
+            } for item in forecast_results.get('forecast', [])
+        ],
+        "model_details": {
+            "type": forecast_results.get('model_used', 'unknown'),
+            "aic": forecast_results.get('aic', None),
+            "bic": forecast_results.get('bic', None),
+            "order": forecast_results.get('order'),
+            "family": forecast_results.get('family'),
+            "link": forecast_results.get('link'),
+            "order_or_family": (
+                f"{forecast_results['order']}" if forecast_results.get('model_used') == 'ARMA' and forecast_results.get('order')
+                else f"GLM({'Gaussiana' if forecast_results.get('family') == 'Gaussian' else forecast_results.get('family')})"
+                    if forecast_results.get('model_used') == 'GLM' and forecast_results.get('family')
+                else "N/A"
             ),
-            "error": forecast_results.get('error')
-        }
+            "significant": not (
+                (forecast_results.get('model_used') == 'GLM' and "não significativas" in (forecast_results.get('warning') or '')) or
+                (forecast_results.get('model_used') == 'ARMA' and "autocorrelação" in (forecast_results.get('warning') or '')) or
+                (forecast_results.get('model_used', '').startswith('Mean Forecast')) or
+                (forecast_results.get('error') is not None)
+            ),
+            "pvalues": forecast_results.get('pvalues', {}),
+            "significance_desc": forecast_results.get('significance_desc'),
+            "confidence_level": forecast_results.get('confidence_level'),
+            "confidence_desc": forecast_results.get('confidence_desc'),
+        },
+        "other_model_details": forecast_results.get('other_model_details'),
+        "message": (
+            forecast_results.get('error')
+            or forecast_results.get('warning')
+            or "Previsão gerada com sucesso."
+        ),
+        "error": forecast_results.get('error')
+    }
+
+
+@forecast_bp.route('/forecast', methods=['GET'])
+def get_forecast_route():
+    try:
+        factor_col = request.args.get('factor_col')
+        factor_value = request.args.get('factor_value')
+        file_id = request.args.get('fileId')
+
+        if not file_id:
+            return jsonify({'error': 'fileId não fornecido na requisição'}), 400
+
+        content_hash = get_processed_file_hash(file_id)
+        cache_key = (
+            forecast_cache_key(content_hash, factor_col, factor_value)
+            if content_hash
+            else None
+        )
+
+        forecast_results = get_cached_forecast(cache_key)
+        if forecast_results is None:
+            df, error_response = _load_forecast_frame(file_id, factor_col, factor_value)
+            if error_response:
+                return error_response
+
+            forecast_results = run_and_evaluate_forecasts(df, cache_key)
+
+        response_data = _build_forecast_response(forecast_results)
 
         status_code = 200 if forecast_results.get('error') is None else 400
         return jsonify(response_data), status_code
@@ -143,3 +170,62 @@ def get_forecast_route():
 
         traceback.print_exc()
         return jsonify({'error': f'Erro interno inesperado ao gerar a previsão. Verifique os logs do servidor.'}), 500
+
+
+@forecast_bp.route('/forecast/batch', methods=['POST'])
+def batch_forecast_route():
+    try:
+        payload = request.get_json(silent=True) or {}
+        file_id = payload.get('fileId')
+        factor_col = payload.get('factor_col')
+        factor_values = payload.get('factor_values')
+
+        if not file_id or not factor_col:
+            return jsonify({'error': 'fileId e factor_col são obrigatórios'}), 400
+        if factor_values is not None and not isinstance(factor_values, list):
+            return jsonify({'error': 'factor_values deve ser uma lista'}), 400
+
+        df, error_response = _load_forecast_frame(file_id, None, None)
+        if error_response:
+            return error_response
+        if factor_col not in df.columns:
+            return jsonify({'error': f"Coluna de fator '{factor_col}' não encontrada nos dados processados."}), 400
+
+        groups = {
+            str(value): group
+            for value, group in df.groupby(factor_col, observed=True, sort=False)
+        }
+
+        truncated = False
+        if factor_values is not None:
+            requested = list(dict.fromkeys(str(v) for v in factor_values))
+            missing = [v for v in requested if v not in groups]
+            selected = [v for v in requested if v in groups]
+        else:
+            missing = []
+            selected = sorted(groups, key=lambda v: len(groups[v]), reverse=True)
+            truncated = len(selected) > FORECAST_BATCH_MAX_GROUPS
+            selected = selected[:FORECAST_BATCH_MAX_GROUPS]
+
+        content_hash = get_processed_file_hash(file_id)
+        cache_keys = (
+            {v: forecast_cache_key(content_hash, factor_col, v) for v in selected}
+            if content_hash
+            else {}
+        )
+        forecasts = run_forecasts_batch({v: groups[v] for v in selected}, cache_keys)
+
+        return jsonify({
+            "factor_col": factor_col,
+            "results": [
+                {"value": v, "count": len(groups[v]), **_build_forecast_response(forecasts[v])}
+                for v in selected
+            ],
+            "missing": missing,
+            "truncated": truncated,
+        }), 200
+
+    except Exception as e:
+
+        traceback.print_exc()
+        return jsonify({'error': f'Erro interno inesperado ao gerar as previsões em lote. Verifique os logs do servidor.'}), 500
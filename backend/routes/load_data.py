@@ -1,10 +1,59 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import (
+    Blueprint,
+    request,
+    jsonify,
+    current_app,
+    Response,
+    stream_with_context,
+)
+import itertools
 import os
-import pandas as pd
-from utils.csv_parser import parse_csv
+from utils.file_utils import get_uploaded_file_path, iter_uploaded_chunks
 
 load_data_bp = Blueprint("load_data", __name__, url_prefix="/api")
 
+STREAM_FORMATS = {"ndjson": "application/x-ndjson", "json": "application/json"}
+
+
+def _iter_pages(file_id, offset=0, limit=None):
+    remaining = limit
+    for chunk in iter_uploaded_chunks(file_id):
+        if offset >= len(chunk):
+            offset -= len(chunk)
+            continue
+        rows = chunk[offset:]
+        offset = 0
+        if remaining is not None:
+            rows = rows[:remaining]
+            remaining -= len(rows)
+        if rows:
+            yield rows
+        if remaining == 0:
+            break
+
+
+def _stream_rows(pages, stream_format):
+    dumps = current_app.json.dumps
+    try:
+        if stream_format == "ndjson":
+            for rows in pages:
+                yield "".join(dumps(row) + "\n" for row in rows)
+        else:
+            yield '{"data":['
+            separator = ""
+            for rows in pages:
+                if not rows:
+                    continue
+                yield separator + dumps(rows)[1:-1]
+                separator = ","
+            yield "]}"
+    except Exception as e:
+        error = f"Erro ao processar dados do arquivo: {str(e)}"
+        if stream_format == "ndjson":
+            yield dumps({"error": error}) + "\n"
+        else:
+            yield '],"error":' + dumps(error) + "}"
+
 
 @load_data_bp.route("/loadData", methods=["POST"])
 def load_data_route():
@@ -15,26 +64,62 @@ def load_data_route():
         if not file_id:
             return jsonify({"error": "fileId não fornecido"}), 400
 
-        file_path = os.path.join(current_app.config["UPLOAD_FOLDER"], file_id)
+        stream_format = data.get("stream")
+        if stream_format is True:
+            stream_format = "ndjson"
+        if stream_format and stream_format not in STREAM_FORMATS:
+            return (
+                jsonify({"error": f"Formato de streaming inválido: {stream_format}"}),
+                400,
+            )
+
+        try:
+            offset = int(data.get("offset") or 0)
+            limit = data.get("limit")
+            limit = int(limit) if limit is not None else None
+            if offset < 0 or (limit is not None and limit < 0):
+                raise ValueError
+        except (TypeError, ValueError):
+            return (
+                jsonify({"error": "offset e limit devem ser inteiros não negativos"}),
+                400,
+            )
+
+        file_path = get_uploaded_file_path(file_id)
 
         if not os.path.exists(file_path):
             return jsonify({"error": "Arquivo não encontrado no servidor"}), 404
 
+        if stream_format:
+            try:
+                pages = _iter_pages(file_id, offset, limit)
+                first_page = next(pages, [])
+            except Exception as e:
+                return (
+                    jsonify({"error": f"Erro ao processar dados do arquivo: {str(e)}"}),
+                    500,
+                )
+            return Response(
+                stream_with_context(
+                    _stream_rows(itertools.chain([first_page], pages), stream_format)
+                ),
+                mimetype=STREAM_FORMATS[stream_format],
+            )
+
         try:
-            with open(file_path, "rb") as f:
-                file_content = f.read()
             all_data = []
-            data_generator = parse_csv(file_content)
-            for chunk in data_generator:
+            page_limit = limit + 1 if limit is not None else None
+            for chunk in _iter_pages(file_id, offset, page_limit):
                 all_data.extend(chunk)
-            cleaned_data = []
-            for row in all_data:
-                cleaned_row = {
-                    key: (None if pd.isna(value) else value)
-                    for key, value in row.items()
-                }
-                cleaned_data.append(cleaned_row)
-            return jsonify({"data": cleaned_data})
+            has_more = limit is not None and len(all_data) > limit
+            if has_more:
+                all_data = all_data[:limit]
+            response_data = {"data": all_data}
+            if offset or limit is not None:
+                response_data.update(
+                    {"offset": offset, "limit": limit, "hasMore": has_more}
+                )
+            return jsonify(response_data)
         except Exception as e:
             return (
                 jsonify({"error": f"Erro ao processar dados do arquivo: {str(e)}"}),
@@ -1,21 +1,36 @@
-from utils.file_utils import load_processed_dataframe
-from flask import Blueprint, request, jsonify, current_app
+from utils.file_utils import load_filtered_dataframe, load_aggregate_cube
+from utils.analysis import AggregateCube
+from config import (
+    PARETO_CROSS_MAX_CARDINALITY,
+    PARETO_CROSS_TOP_N,
+    PARETO_CROSS_WORKERS,
+)
+from flask import Blueprint, request, jsonify
 import pandas as pd
-import os
-from typing import List, Tuple
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 
 pareto_bp = Blueprint("pareto", __name__, url_prefix="/api")
 
+_EMPTY_TOTALS = pd.DataFrame({"sum": [], "count": []})
+OTHERS_LABEL = "Outros"
+
+_cross_executor = None
+_cross_executor_lock = threading.Lock()
+
 
 def calculate_pareto(
     df: pd.DataFrame, category_col: str, value_col: str, tipo_metrica: str = "sum"
 ) -> Tuple[List[str], List[float], List[float]]:
     try:
         if tipo_metrica == "avg":
-            df_grouped = df.groupby(category_col, as_index=False)[value_col].mean()
+            df_grouped = df.groupby(category_col, as_index=False, observed=True)[
+                value_col
+            ].mean()
         elif tipo_metrica == "score":
             df_grouped = (
-                df.groupby(category_col)
+                df.groupby(category_col, observed=True)
                 .agg({value_col: ["mean", "count"]})
                 .reset_index()
             )
@@ -24,25 +39,200 @@ def calculate_pareto(
             df_grouped = df_grouped[[category_col, "score"]]
             df_grouped = df_grouped.rename(columns={"score": value_col})
         else:
-            df_grouped = df.groupby(category_col, as_index=False)[value_col].sum()
+            df_grouped = df.groupby(category_col, as_index=False, observed=True)[
+                value_col
+            ].sum()
 
-        df_sorted = df_grouped.sort_values(by=value_col, ascending=False)
-        df_sorted["cumulative_sum"] = df_sorted[value_col].cumsum()
-        total = df_sorted[value_col].sum()
-        df_sorted["cumulative_percent"] = (
-            (df_sorted["cumulative_sum"] / total) * 100 if total != 0 else 0
-        )
+        return _summarize_pareto(df_grouped, category_col, value_col)
 
-        categories = df_sorted[category_col].astype(str).tolist()
-        values = df_sorted[value_col].astype(float).round(2).tolist()
-        cumulative = df_sorted["cumulative_percent"].round(2).tolist()
+    except Exception as e:
+        raise Exception(f"Erro ao calcular Pareto: {str(e)}")
 
-        return categories, values, cumulative
+
+def calculate_pareto_from_totals(
+    totals: pd.DataFrame, tipo_metrica: str = "sum", top_n: Optional[int] = None
+) -> Tuple[List[str], List[float], List[float]]:
+    try:
+        # Rótulos como em calculate_pareto, antes de misturar com "Outros".
+        totals = totals.set_axis(pd.Series(totals.index).astype(str).to_numpy())
+        totals = totals.assign(metric=_totals_metric(totals, tipo_metrica))
+        totals = totals.sort_values("metric", ascending=False, kind="stable")
+        if top_n is not None and len(totals) > top_n:
+            rest = totals.iloc[top_n:][["sum", "count"]].sum()
+            others = pd.DataFrame(
+                {"sum": [rest["sum"]], "count": [rest["count"]]},
+                index=[OTHERS_LABEL],
+            )
+            others["metric"] = _totals_metric(others, tipo_metrica)
+            totals = pd.concat([totals.iloc[:top_n], others])
+
+        df_grouped = pd.DataFrame(
+            {"category": totals.index, "value": totals["metric"].to_numpy()}
+        )
+        return _summarize_pareto(df_grouped, "category", "value", sort=False)
 
     except Exception as e:
         raise Exception(f"Erro ao calcular Pareto: {str(e)}")
 
 
+def _totals_metric(totals: pd.DataFrame, tipo_metrica: str) -> pd.Series:
+    if tipo_metrica == "avg":
+        return totals["sum"] / totals["count"]
+    # score = média × contagem, que é a própria soma do grupo.
+    return totals["sum"]
+
+
+def _summarize_pareto(
+    df_grouped: pd.DataFrame, category_col: str, value_col: str, sort: bool = True
+) -> Tuple[List[str], List[float], List[float]]:
+    df_sorted = (
+        df_grouped.sort_values(by=value_col, ascending=False) if sort else df_grouped
+    )
+    df_sorted["cumulative_sum"] = df_sorted[value_col].cumsum()
+    total = df_sorted[value_col].sum()
+    df_sorted["cumulative_percent"] = (
+        (df_sorted["cumulative_sum"] / total) * 100 if total != 0 else 0
+    )
+
+    categories = df_sorted[category_col].astype(str).tolist()
+    values = df_sorted[value_col].astype(float).round(2).tolist()
+    cumulative = df_sorted["cumulative_percent"].round(2).tolist()
+
+    return categories, values, cumulative
+
+
+def _column_cardinality(series: pd.Series) -> int:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return len(series.cat.categories)
+    return int(series.nunique())
+
+
+def _get_cross_executor() -> ThreadPoolExecutor:
+    global _cross_executor
+    with _cross_executor_lock:
+        if _cross_executor is None:
+            _cross_executor = ThreadPoolExecutor(max_workers=PARETO_CROSS_WORKERS)
+        return _cross_executor
+
+
+def _raw_cross_totals(df: pd.DataFrame, columns: List[str]) -> Dict[str, Any]:
+    """Agrupa cada coluna em paralelo; o groupby do pandas libera o GIL."""
+    if len(columns) <= 1 or PARETO_CROSS_WORKERS <= 1:
+        results = [_safe_group_totals(df, col) for col in columns]
+    else:
+        results = list(
+            _get_cross_executor().map(lambda col: _safe_group_totals(df, col), columns)
+        )
+    return dict(zip(columns, results))
+
+
+def _safe_group_totals(df: pd.DataFrame, col: str) -> Any:
+    try:
+        return df.groupby(col, observed=True)["delay_days"].agg(["sum", "count"])
+    except Exception as e:
+        return e
+
+
+def _build_cross_analysis(
+    cross_totals: Dict[str, Any], columns: List[str], tipo_metrica: str
+) -> Dict[str, Any]:
+    analise_cruzada = {}
+    for other_col in columns:
+        totals = cross_totals.get(other_col, _EMPTY_TOTALS)
+        try:
+            if isinstance(totals, Exception):
+                raise totals
+            cats, vals, cumuls = calculate_pareto_from_totals(
+                totals, tipo_metrica, PARETO_CROSS_TOP_N
+            )
+            analise_cruzada[other_col] = {
+                "categories": cats,
+                "values": vals,
+                "cumulative": cumuls,
+            }
+        except Exception as e:
+            analise_cruzada[other_col] = {"error": str(e)}
+    return analise_cruzada
+
+
+def _format_date(value) -> Optional[str]:
+    return value.strftime("%Y-%m-%d") if pd.notnull(value) else None
+
+
+def _pareto_from_cube(
+    cube: AggregateCube,
+    months,
+    file_id: str,
+    fator: str,
+    fator_valor: Optional[str],
+    data_inicio: Optional[str],
+    data_fim: Optional[str],
+    tipo_metrica: str,
+):
+    totals, min_date, max_date = cube.factor_totals(fator, fator_valor, months)
+    if totals.empty:
+        return (
+            jsonify({"error": "Nenhum dado encontrado para os filtros aplicados"}),
+            400,
+        )
+
+    categories, values, cumulative = calculate_pareto_from_totals(totals, tipo_metrica)
+    pareto_principal = {
+        "categories": categories,
+        "values": values,
+        "cumulative": cumulative,
+        "count": int(totals["count"].sum()),
+    }
+
+    analise_cruzada = {}
+    omitidos = {}
+    if fator_valor is not None:
+        cardinality = cube.meta.get("cardinality", {})
+        other_cols = []
+        for col in cube.cross_columns:
+            if col == fator:
+                continue
+            if cardinality.get(col, 0) > PARETO_CROSS_MAX_CARDINALITY:
+                omitidos[col] = cardinality[col]
+            else:
+                other_cols.append(col)
+
+        cross = cube.cross_totals(fator, fator_valor, months)
+        raw_cols = [col for col in other_cols if not cube.has_pair(fator, col)]
+        if raw_cols:
+            df, load_error = load_filtered_dataframe(
+                file_id,
+                columns=raw_cols + [fator, "delay_days"],
+                data_inicio=data_inicio,
+                data_fim=data_fim,
+                factor_col=fator,
+                factor_value=fator_valor,
+            )
+            if load_error:
+                status_code = 404 if "não encontrado" in load_error else 500
+                return jsonify({"error": load_error}), status_code
+            df = df.dropna(subset=[fator, "delay_days"])
+            for col in raw_cols:
+                col_cardinality = _column_cardinality(df[col])
+                if col_cardinality > PARETO_CROSS_MAX_CARDINALITY:
+                    omitidos[col] = col_cardinality
+            raw_cols = [col for col in raw_cols if col not in omitidos]
+            other_cols = [col for col in other_cols if col not in omitidos]
+            cross.update(_raw_cross_totals(df, raw_cols))
+
+        analise_cruzada = _build_cross_analysis(cross, other_cols, tipo_metrica)
+
+    return jsonify(
+        {
+            "pareto_principal": pareto_principal,
+            "analise_cruzada": analise_cruzada,
+            "analise_cruzada_omitida": omitidos,
+            "min_date": _format_date(min_date),
+            "max_date": _format_date(max_date),
+        }
+    )
+
+
 @pareto_bp.route("/analyze/pareto-advanced", methods=["POST"])
 def advanced_pareto():
     try:
@@ -59,14 +249,43 @@ def advanced_pareto():
 
         if not file_id or not fator:
             return jsonify({"error": "fileId e fator são obrigatórios"}), 400
+        if fator_valor in ["", "ALL"]:
+            fator_valor = None
 
-        processed_file_path = os.path.join(
-            current_app.config["PROCESSED_FOLDER"], f"{file_id}.parquet"
-        )
-        if not os.path.exists(processed_file_path):
-            return jsonify({"error": "Arquivo não encontrado"}), 404
+        cube = load_aggregate_cube(file_id)
+        months = cube.month_range(data_inicio, data_fim) if cube is not None else None
+        if months is not None:
+            if fator not in cube.factors:
+                return (
+                    jsonify(
+                        {
+                            "error": "Fator não encontrado entre os fatores disponíveis do upload"
+                        }
+                    ),
+                    400,
+                )
+            if cube.has_factor(fator):
+                return _pareto_from_cube(
+                    cube,
+                    months,
+                    file_id,
+                    fator,
+                    fator_valor,
+                    data_inicio,
+                    data_fim,
+                    tipo_metrica,
+                )
 
-        df = pd.read_parquet(processed_file_path)
+        df, load_error = load_filtered_dataframe(
+            file_id,
+            data_inicio=data_inicio,
+            data_fim=data_fim,
+            factor_col=fator,
+            factor_value=fator_valor,
+        )
+        if load_error:
+            status_code = 404 if "não encontrado" in load_error else 500
+            return jsonify({"error": load_error}), status_code
 
         if "delay_days" not in df.columns:
             if "actual_date" in df.columns and "estimated_date" in df.columns:
@@ -101,18 +320,26 @@ def advanced_pareto():
                 400,
             )
 
-        if fator_valor is not None and fator_valor != "" and fator_valor != "ALL":
-            df = df[df[fator] == fator_valor]
-        if data_inicio:
-            df = df[df["actual_date"] >= data_inicio]
-        if data_fim:
-            df = df[df["actual_date"] <= data_fim]
         df = df.dropna(subset=[fator, "delay_days"])
 
-        min_date = df["actual_date"].min()
-        max_date = df["actual_date"].max()
-        min_date_str = min_date.strftime("%Y-%m-%d") if pd.notnull(min_date) else None
-        max_date_str = max_date.strftime("%Y-%m-%d") if pd.notnull(max_date) else None
+        omitidos = {}
+        other_cols = []
+        if fator_valor is not None:
+            # Com cubo, vale a cardinalidade do arquivo inteiro, como na rota do cubo.
+            known = cube.meta.get("cardinality", {}) if cube is not None else {}
+            for col in df.columns:
+                if col in ["delay_days", "actual_date"] or col == fator:
+                    continue
+                cardinality = known.get(col)
+                if cardinality is None:
+                    cardinality = _column_cardinality(df[col])
+                if cardinality > PARETO_CROSS_MAX_CARDINALITY:
+                    omitidos[col] = cardinality
+                else:
+                    other_cols.append(col)
+
+        min_date_str = _format_date(df["actual_date"].min())
+        max_date_str = _format_date(df["actual_date"].max())
 
         if df.empty:
             return (
@@ -130,32 +357,18 @@ def advanced_pareto():
             "count": len(df),
         }
 
-        analise_cruzada = {}
-        fatores_validos = [
-            col for col in df.columns if col not in ["delay_days", "actual_date"]
-        ]
-        if fator and payload.get("fatorValor") not in [None, "", "ALL"]:
-            for other_col in fatores_validos:
-                if other_col != fator:
-                    try:
-                        cats, vals, cumuls = calculate_pareto(
-                            df, other_col, "delay_days", tipo_metrica
-                        )
-                        analise_cruzada[other_col] = {
-                            "categories": cats,
-                            "values": vals,
-                            "cumulative": cumuls,
-                        }
-                    except Exception as e:
-                        analise_cruzada[other_col] = {"error": str(e)}
+        analise_cruzada = _build_cross_analysis(
+            _raw_cross_totals(df, other_cols), other_cols, tipo_metrica
+        )
 
         return jsonify(
             {
                 "pareto_principal": pareto_principal,
                 "analise_cruzada": analise_cruzada,
+                "analise_cruzada_omitida": omitidos,
                 "min_date": min_date_str,
                 "max_date": max_date_str,
             }
         )
     except Exception as e:
-        return jsonify({"error": f"Erro interno do servidor: {str(e)}"}), 500
\ No newline at end of file
+        return jsonify({"error": f"Erro interno do servidor: {str(e)}"}), 500
@@ -1,10 +1,22 @@
 from flask import Blueprint, request, jsonify
-import pandas as pd
+import os
 import uuid
 from werkzeug.utils import secure_filename
-from utils.csv_parser import parse_csv
+from utils.csv_parser import EmptyFileError, sniff_encoding
 from utils.data_prep import infer_column_types
-from utils.file_utils import allowed_file, save_uploaded_file
+from utils.excel_parser import (
+    EXCEL_FORMATS,
+    UnsupportedFormatError,
+    detect_file_format,
+)
+from utils.file_utils import (
+    allowed_file,
+    convert_upload_to_parquet,
+    get_uploaded_parquet_path,
+    iter_uploaded_chunks,
+    save_uploaded_file,
+)
+from config import UPLOAD_CONVERT_TO_PARQUET
 
 parse_bp = Blueprint("parse", __name__, url_prefix="/api")
 
@@ -25,35 +37,41 @@ def parse_file_route():
             return jsonify({"error": "Tipo de arquivo não permitido"}), 400
 
         file_id = f"{uuid.uuid4()}_{secure_filename(file.filename)}"
-        file_content_bytes = file.read()
-        file.seek(0)
-
-        saved_path, save_error = save_uploaded_file(file, file_id)
+        upload, save_error = save_uploaded_file(file, file_id)
         if save_error:
-            return jsonify({"error": save_error}), 500
+            status_code = 413 if "tamanho máximo" in save_error else 500
+            return jsonify({"error": save_error}), status_code
 
         try:
-            data_chunks = parse_csv(file_content_bytes)
-            first_chunk = next(data_chunks)
+            # O arquivo salvo é lido uma única vez; a prévia sai da cópia em parquet.
+            file_format = detect_file_format(upload["head"])
+            if file_format in EXCEL_FORMATS:
+                encoding_info = {
+                    "encoding": None,
+                    "strategy": file_format,
+                    "confidence": 1.0,
+                }
+            else:
+                encoding_info = sniff_encoding(upload["path"])
+            already_converted = upload["deduplicated"] and os.path.exists(
+                get_uploaded_parquet_path(file_id)
+            )
+            if UPLOAD_CONVERT_TO_PARQUET and not already_converted:
+                # Se a conversão falhar, as rotas seguintes leem o arquivo original.
+                convert_upload_to_parquet(
+                    file_id, file_format, encoding_info["encoding"]
+                )
+            data_chunks = iter_uploaded_chunks(
+                file_id, encoding=encoding_info["encoding"]
+            )
+            try:
+                first_chunk = next(data_chunks)
+            finally:
+                data_chunks.close()
 
             if not isinstance(first_chunk, list):
                 raise TypeError("Parsed data chunk is not a list.")
 
-            cleaned_first_chunk = []
-            if isinstance(first_chunk, list):
-                for row in first_chunk:
-                    cleaned_row = (
-                        {
-                            key: (None if pd.isna(value) else value)
-                            for key, value in row.items()
-                        }
-                        if isinstance(row, dict)
-                        else row
-                    )
-                    cleaned_first_chunk.append(cleaned_row)
-            else:
-                cleaned_first_chunk = first_chunk
-
             columns = infer_column_types(first_chunk)
 
             if not isinstance(columns, list):
@@ -61,9 +79,11 @@ def parse_file_route():
 
             response_data = {
                 "columns": columns,
-                "data": cleaned_first_chunk,
-                "chunked": len(file_content_bytes) > 10 * 1024 * 1024,
+                "data": first_chunk,
+                "chunked": upload["size"] > 10 * 1024 * 1024,
                 "fileId": file_id,
+                "contentHash": upload["contentHash"],
+                "encoding": encoding_info,
             }
             return jsonify(response_data)
 
@@ -72,6 +92,10 @@ def parse_file_route():
                 jsonify({"error": "Arquivo CSV vazio ou contém apenas cabeçalho"}),
                 400,
             )
+        except EmptyFileError as e:
+            return jsonify({"error": str(e)}), 400
+        except UnsupportedFormatError as e:
+            return jsonify({"error": str(e)}), 415
         except Exception as e:
             return jsonify({"error": f"Erro ao processar arquivo: {str(e)}"}), 500
 
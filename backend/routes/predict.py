@@ -1,48 +1,134 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
+import json
 import pandas as pd
-from utils.predictor import predict_delay
-from utils.file_utils import load_processed_dataframe
+from utils.predictor import predict_delay, predict_delay_batch
+from utils.model_training import model_training_status, schedule_model_training
+from utils.file_utils import (
+    get_processed_columns,
+    get_processed_file_hash,
+    load_delivery_model,
+    load_prediction_index,
+)
+from config import PREDICT_BATCH_MAX_QUERIES
+
+PREDICT_MODES = ("historical", "model")
 
 predict_bp = Blueprint("predict", __name__, url_prefix="/api")
 
 
+def _missing_query_columns(queries, base_cols):
+    missing_cols = []
+    for query in queries:
+        for col in query:
+            if col in missing_cols or (
+                col in base_cols
+                or (col.endswith("_min") and col[:-4] in base_cols)
+                or (col.endswith("_max") and col[:-4] in base_cols)
+            ):
+                continue
+            missing_cols.append(col)
+    return missing_cols
+
+
+def _read_batch_request():
+    """Consultas em lote: lista `queries` no JSON ou CSV enviado no campo `file`."""
+    if "file" in request.files:
+        file_id = request.form.get("fileId")
+        manifest = pd.read_csv(request.files["file"], dtype=str, keep_default_na=False)
+        queries = manifest.to_dict(orient="records")
+        columns_info = request.form.get("columns")
+        columns_info = (
+            json.loads(columns_info) if columns_info else list(manifest.columns)
+        )
+        return queries, columns_info, file_id, request.form.get("mode")
+
+    payload = request.get_json()
+    return (
+        payload.get("queries"),
+        payload.get("columns") or [],
+        payload.get("fileId"),
+        payload.get("mode"),
+    )
+
+
+def _load_trained_model(file_id):
+    """Modelo treinado do arquivo, ou None e o estado do treino agendado."""
+    predictor = load_delivery_model(file_id)
+    if predictor is not None:
+        return predictor, "ready"
+    source_hash = get_processed_file_hash(file_id)
+    if source_hash is None:
+        return None, None
+    schedule_model_training(current_app._get_current_object(), file_id, source_hash)
+    return None, model_training_status(file_id, source_hash)
+
+
 @predict_bp.route("/predict", methods=["POST"])
 def predict_route():
     try:
-        payload = request.json
-        if not payload:
-            return jsonify({"error": "Dados não fornecidos"}), 400
+        payload = None
+        if "file" not in request.files:
+            payload = request.get_json(silent=True)
+            if not payload or not isinstance(payload, dict):
+                return jsonify({"error": "Dados não fornecidos"}), 400
 
-        query = payload.get("query")
-        columns_info = payload.get("columns")
-        file_id = payload.get("fileId")
+        is_batch = payload is None or "queries" in payload
+        if is_batch:
+            queries, columns_info, file_id, mode = _read_batch_request()
+            if not isinstance(queries, list) or not queries or not file_id:
+                return (
+                    jsonify(
+                        {
+                            "error": "Payload incompleto: lista de consultas ou fileId ausentes"
+                        }
+                    ),
+                    400,
+                )
+            if not all(isinstance(query, dict) for query in queries):
+                return jsonify({"error": "Cada consulta deve ser um objeto"}), 400
+            if len(queries) > PREDICT_BATCH_MAX_QUERIES:
+                return (
+                    jsonify(
+                        {
+                            "error": f"Máximo de {PREDICT_BATCH_MAX_QUERIES} consultas por requisição"
+                        }
+                    ),
+                    400,
+                )
+        else:
+            query = payload.get("query")
+            columns_info = payload.get("columns")
+            file_id = payload.get("fileId")
+            mode = payload.get("mode")
 
-        if not query or not columns_info or not file_id:
+            if not query or not columns_info or not file_id:
+                return (
+                    jsonify(
+                        {
+                            "error": "Payload incompleto: query, informações das colunas ou fileId ausentes"
+                        }
+                    ),
+                    400,
+                )
+            queries = [query]
+
+        mode = mode or "historical"
+        if mode not in PREDICT_MODES:
             return (
                 jsonify(
                     {
-                        "error": "Payload incompleto: query, informações das colunas ou fileId ausentes"
+                        "error": f"Modo inválido: {mode}. Use um de: {', '.join(PREDICT_MODES)}"
                     }
                 ),
                 400,
             )
 
-        df_processed, load_error = load_processed_dataframe(file_id)
+        base_cols, load_error = get_processed_columns(file_id)
         if load_error:
             status_code = 404 if "não encontrado" in load_error else 500
             return jsonify({"error": load_error}), status_code
 
-        query_cols = list(query.keys())
-        base_cols = set(df_processed.columns)
-        missing_cols = [
-            col
-            for col in query_cols
-            if not (
-                col in base_cols
-                or (col.endswith("_min") and col[:-4] in base_cols)
-                or (col.endswith("_max") and col[:-4] in base_cols)
-            )
-        ]
+        missing_cols = _missing_query_columns(queries, set(base_cols))
         if missing_cols:
             return (
                 jsonify(
@@ -53,12 +139,42 @@ def predict_route():
                 400,
             )
 
-        prediction_results = predict_delay(df_processed, query, columns_info)
+        model_status = None
+        if mode == "model":
+            predictor, model_status = _load_trained_model(file_id)
+            if predictor is not None:
+                results = predictor.predict_many(queries)
+                if is_batch:
+                    return jsonify(
+                        {
+                            "results": results,
+                            "count": len(results),
+                            "modelStatus": model_status,
+                        }
+                    )
+                prediction_results = results[0]
+                if "error" in prediction_results:
+                    return jsonify({"error": prediction_results["error"]}), 400
+                return jsonify({**prediction_results, "modelStatus": model_status})
+
+        # Sem modelo pronto, responde pelo histórico enquanto o treino roda.
+        index, load_error = load_prediction_index(file_id)
+        if load_error:
+            status_code = 404 if "não encontrado" in load_error else 500
+            return jsonify({"error": load_error}), status_code
+
+        extra = {"modelStatus": model_status} if mode == "model" else {}
+        if is_batch:
+            # Erros de uma consulta ficam no próprio resultado, sem derrubar o lote.
+            results = predict_delay_batch(index, queries, columns_info)
+            return jsonify({"results": results, "count": len(results), **extra})
+
+        prediction_results = predict_delay(index, query, columns_info)
 
         if isinstance(prediction_results, dict) and "error" in prediction_results:
             return jsonify({"error": prediction_results["error"]}), 400
 
-        return jsonify(prediction_results)
+        return jsonify({**prediction_results, **extra})
 
     except Exception as e:
         return (
@@ -1,11 +1,21 @@
 from flask import Blueprint, request, jsonify
 import pandas as pd
 import os
-from utils.file_utils import load_processed_dataframe
-import random
+from utils.file_utils import (
+    load_filtered_dataframe,
+    load_value_index,
+    get_processed_columns,
+)
+from utils.sampling import SAMPLING_STRATEGIES, sample_rows
+from utils.value_index import rank_counts, select_values
 
 scatter_bp = Blueprint("scatter", __name__, url_prefix="/api")
 
+LEADING_COLS = ["actual_date", "estimated_date", "delay_days"]
+REQUIRED_COLS = ["actual_date", "delay_days"]
+# Semente fixa: a mesma consulta devolve sempre a mesma amostra.
+DEFAULT_SEED = 0
+
 
 @scatter_bp.route("/scatter-factor-values", methods=["POST"])
 def scatter_factor_values():
@@ -15,28 +25,50 @@ def scatter_factor_values():
         fator = payload.get("fator")
         data_inicio = payload.get("dataInicio")
         data_fim = payload.get("dataFim")
+        prefix = payload.get("prefix")
         if not file_id or not fator:
             return (
                 jsonify({"error": "fileId e fator são obrigatórios"}),
                 400,
             )
-        df, load_error = load_processed_dataframe(file_id)
-        if load_error or df is None:
-            return (
-                jsonify({"error": f"Erro ao carregar dados: {load_error}"}),
-                500,
-            )
-        if data_inicio:
-            df = df[df["actual_date"] >= data_inicio]
-        if data_fim:
-            df = df[df["actual_date"] <= data_fim]
-        if fator not in df.columns:
+        try:
+            top_k = payload.get("topK")
+            top_k = int(top_k) if top_k is not None else None
+            if top_k is not None and top_k < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            return jsonify({"error": "topK deve ser um inteiro não negativo"}), 400
+
+        index = load_value_index(file_id)
+        if index is not None and fator not in index.columns:
             return (
                 jsonify({"error": "Fator não encontrado no dataset"}),
                 400,
             )
-        values = df[fator].dropna().unique().tolist()
-        return jsonify({"values": values}), 200
+        counts = index.lookup(fator, data_inicio, data_fim) if index else None
+        if counts is None:
+            df, load_error = load_filtered_dataframe(
+                file_id, columns=[fator], data_inicio=data_inicio, data_fim=data_fim
+            )
+            if load_error or df is None:
+                return (
+                    jsonify({"error": f"Erro ao carregar dados: {load_error}"}),
+                    500,
+                )
+            if fator not in df.columns:
+                return (
+                    jsonify({"error": "Fator não encontrado no dataset"}),
+                    400,
+                )
+            counts = rank_counts(df[fator].value_counts())
+
+        values, total = select_values(counts, prefix, top_k)
+        return (
+            jsonify(
+                {"values": values, "total": total, "truncated": total > len(values)}
+            ),
+            200,
+        )
     except Exception as e:
         return jsonify({"error": f"Erro interno: {str(e)}"}), 500
 
@@ -51,64 +83,76 @@ def scatter_data_route():
         data_inicio = payload.get("dataInicio")
         data_fim = payload.get("dataFim")
         limit = int(payload.get("limit", 1000))
+        strategy = payload.get("strategy", "uniform")
+        columns = payload.get("columns")
 
         if not file_id:
             return jsonify({"error": "fileId não fornecido"}), 400
+        if strategy not in SAMPLING_STRATEGIES:
+            return (
+                jsonify({"error": f"Estratégia de amostragem inválida: {strategy}"}),
+                400,
+            )
+        try:
+            seed = int(payload.get("seed", DEFAULT_SEED))
+        except (TypeError, ValueError):
+            return jsonify({"error": "seed deve ser um número inteiro"}), 400
+        if columns is not None and not isinstance(columns, list):
+            return jsonify({"error": "columns deve ser uma lista de colunas"}), 400
 
-        df, load_error = load_processed_dataframe(file_id)
+        if fator_valor == "ALL":
+            fator_valor = None
+        all_columns, load_error = get_processed_columns(file_id)
+        if load_error:
+            return jsonify({"error": f"Erro ao carregar dados: {load_error}"}), 500
+        if columns is not None:
+            columns = list(dict.fromkeys(REQUIRED_COLS + columns))
+            if fator:
+                columns.append(fator)
+        df, load_error = load_filtered_dataframe(
+            file_id,
+            columns=columns,
+            data_inicio=data_inicio,
+            data_fim=data_fim,
+            factor_col=fator or None,
+            factor_value=fator_valor,
+        )
         if load_error or df is None:
             return jsonify({"error": f"Erro ao carregar dados: {load_error}"}), 500
 
-        if data_inicio:
-            df = df[df["actual_date"] >= data_inicio]
-        if data_fim:
-            df = df[df["actual_date"] <= data_fim]
-
-        if fator and fator in df.columns:
-            if fator_valor is not None and fator_valor != "ALL":
-                df = df[df[fator] == fator_valor]
-            scatter_data = (
-                df[
-                    ["actual_date", "estimated_date", "delay_days"]
-                    + [
-                        col
-                        for col in df.columns
-                        if col not in ["actual_date", "estimated_date", "delay_days"]
-                    ]
-                ]
-                .dropna(subset=["actual_date", "delay_days"])
-                .to_dict(orient="records")
-            )
-        else:
-            scatter_data = (
-                df[
-                    ["actual_date", "estimated_date", "delay_days"]
-                    + [
-                        col
-                        for col in df.columns
-                        if col not in ["actual_date", "estimated_date", "delay_days"]
-                    ]
-                ]
-                .dropna(subset=["actual_date", "delay_days"])
-                .to_dict(orient="records")
-            )
-
-        if len(scatter_data) > limit:
-            scatter_data = random.sample(scatter_data, limit)
-
         min_date = df["actual_date"].min()
         max_date = df["actual_date"].max()
         min_date_str = min_date.strftime("%Y-%m-%d") if pd.notnull(min_date) else None
         max_date_str = max_date.strftime("%Y-%m-%d") if pd.notnull(max_date) else None
 
+        output_cols = [col for col in LEADING_COLS if col in df.columns] + [
+            col
+            for col in df.columns
+            if col not in LEADING_COLS and (columns is None or col in columns)
+        ]
+        points = df[output_cols].dropna(subset=["actual_date", "delay_days"])
+        sample = sample_rows(
+            points,
+            limit,
+            strategy=strategy,
+            seed=seed,
+            strata_col=fator if fator in points.columns else None,
+        )
+        scatter_data = sample.to_dict(orient="records")
+
         return (
             jsonify(
                 {
                     "scatter": scatter_data,
-                    "columns": list(df.columns),
+                    "columns": all_columns,
                     "min_date": min_date_str,
                     "max_date": max_date_str,
                     "count": len(scatter_data),
+                    "sampling": {
+                        "strategy": strategy,
+                        "seed": seed,
+                        "total": len(points),
+                    },
                 }
             ),
             200,
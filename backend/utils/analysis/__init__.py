@@ -1,11 +1,22 @@
 from .statistics import calculate_delay_statistics
 from .factors import perform_factor_analysis
-from .forecast import run_and_evaluate_forecasts
+from .forecast import (
+    run_and_evaluate_forecasts,
+    forecast_cache_key,
+    get_cached_forecast,
+    run_forecasts_batch,
+)
 from .insights import generate_insights
+from .cube import AggregateCube, build_aggregate_cube
 
 __all__ = [
     "calculate_delay_statistics",
     "perform_factor_analysis",
     "run_and_evaluate_forecasts",
+    "forecast_cache_key",
+    "get_cached_forecast",
+    "run_forecasts_batch",
     "generate_insights",
+    "AggregateCube",
+    "build_aggregate_cube",
 ]
@@ -0,0 +1,320 @@
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import Dict, Any, Optional, List, Tuple
+from config import CUBE_MAX_GROUP_ROWS, PARETO_CROSS_MAX_CARDINALITY
+
+CUBE_VERSION = 1
+CUBE_METADATA_KEY = b"paic.cube"
+NON_CROSS_COLS = ["actual_date", "delay_days"]
+RESERVED_COLS = ["estimated_date", "actual_date", "delay_days"]
+LABEL_COLS = ["factor", "value", "other_factor", "other_value"]
+
+
+def _factorize(series: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    codes, uniques = pd.factorize(series)
+    # Mesmo texto produzido por calculate_pareto (astype(str) sobre a coluna agrupada).
+    labels = pd.Series(uniques).astype(str).to_numpy(dtype=object)
+    return codes.astype(np.int64), labels
+
+
+def _group_totals(
+    keys: List[np.ndarray], sizes: List[int], delay: np.ndarray
+) -> Optional[Tuple[List[np.ndarray], np.ndarray, np.ndarray, np.ndarray]]:
+    combined = np.zeros(len(delay), dtype=np.int64)
+    for codes, size in zip(keys, sizes):
+        combined = combined * size + codes
+    grouped = pd.Series(delay).groupby(combined, sort=True).agg(["sum", "count"])
+    if len(grouped) > CUBE_MAX_GROUP_ROWS:
+        return None
+
+    decoded = []
+    remainder = grouped.index.to_numpy(dtype=np.int64)
+    for size in reversed(sizes):
+        remainder, codes = np.divmod(remainder, size)
+        decoded.append(codes)
+    decoded.reverse()
+    return (
+        decoded,
+        grouped["sum"].to_numpy(dtype=np.float64),
+        grouped["count"].to_numpy(dtype=np.int64),
+        grouped.index.to_numpy(dtype=np.int64),
+    )
+
+
+class AggregateCube:
+    """Soma e contagem de delay_days por fator, par de fatores e mês."""
+
+    def __init__(self, totals: pd.DataFrame, pairs: pd.DataFrame, meta: Dict[str, Any]):
+        self.totals = totals
+        self.pairs = pairs
+        self.meta = meta
+
+    @property
+    def factors(self) -> List[str]:
+        return self.meta["factors"]
+
+    @property
+    def cross_columns(self) -> List[str]:
+        return self.meta["cross_columns"]
+
+    def has_factor(self, fator: str) -> bool:
+        return fator in self.meta["total_columns"]
+
+    def has_pair(self, fator: str, other_col: str) -> bool:
+        return other_col in self.meta["pair_columns"].get(fator, [])
+
+    def month_range(
+        self, data_inicio: Optional[str], data_fim: Optional[str]
+    ) -> Optional[Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]]:
+        """Converte o filtro de datas em meses; None se não coincidir com meses inteiros."""
+        try:
+            start = pd.Timestamp(data_inicio) if data_inicio else None
+            end = pd.Timestamp(data_fim) if data_fim else None
+        except (TypeError, ValueError):
+            return None
+
+        if start is not None and (
+            start.tz is not None or start != start.normalize() or start.day != 1
+        ):
+            return None
+        if end is not None:
+            # Horários no último dia do mês ficariam de fora do filtro original.
+            if (
+                end.tz is not None
+                or end != end.normalize()
+                or not end.is_month_end
+                or not self.meta["dates_normalized"]
+            ):
+                return None
+            end = end.to_period("M").start_time
+        return start, end
+
+    @staticmethod
+    def _in_months(
+        frame: pd.DataFrame,
+        months: Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]],
+    ) -> pd.DataFrame:
+        start, end = months
+        if start is not None:
+            frame = frame[frame["month"] >= start]
+        if end is not None:
+            frame = frame[frame["month"] <= end]
+        return frame
+
+    def factor_totals(
+        self,
+        fator: str,
+        fator_valor: Optional[str],
+        months: Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]],
+    ) -> Tuple[pd.DataFrame, Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+        rows = self.totals[self.totals["factor"] == fator]
+        if fator_valor is not None:
+            rows = rows[rows["value"] == str(fator_valor)]
+        rows = self._in_months(rows, months)
+
+        grouped = rows.groupby("value", observed=True)[["sum", "count"]].sum()
+        grouped = grouped[grouped["count"] > 0]
+        return grouped, rows["min_date"].min(), rows["max_date"].max()
+
+    def cross_totals(
+        self,
+        fator: str,
+        fator_valor: str,
+        months: Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]],
+    ) -> Dict[str, pd.DataFrame]:
+        rows = self.pairs[
+            (self.pairs["factor"] == fator) & (self.pairs["value"] == str(fator_valor))
+        ]
+        rows = self._in_months(rows, months)
+
+        grouped = rows.groupby(["other_factor", "other_value"], observed=True)[
+            ["sum", "count"]
+        ].sum()
+        grouped = grouped[grouped["count"] > 0]
+        return {
+            other_col: grouped.xs(other_col, level="other_factor")
+            for other_col in grouped.index.get_level_values("other_factor").unique()
+        }
+
+    def to_parquet(self, path: str) -> None:
+        frame = pd.concat(
+            [self.totals.assign(level=1), self.pairs.assign(level=2)],
+            ignore_index=True,
+        )
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[CUBE_METADATA_KEY] = json.dumps(self.meta).encode()
+        pq.write_table(table.replace_schema_metadata(metadata), path)
+
+    @classmethod
+    def read_parquet(cls, path: str) -> Optional["AggregateCube"]:
+        table = pq.read_table(path)
+        raw_meta = (table.schema.metadata or {}).get(CUBE_METADATA_KEY)
+        if raw_meta is None:
+            return None
+        meta = json.loads(raw_meta)
+        if meta.get("version") != CUBE_VERSION:
+            return None
+
+        frame = table.to_pandas()
+        for col in LABEL_COLS:
+            frame[col] = frame[col].astype("category")
+        totals = frame[frame["level"] == 1].drop(columns="level")
+        pairs = frame[frame["level"] == 2].drop(columns="level")
+        return cls(totals, pairs, meta)
+
+
+def build_aggregate_cube(
+    df: pd.DataFrame, source_hash: Optional[str] = None
+) -> Optional[AggregateCube]:
+    if "delay_days" not in df.columns or "actual_date" not in df.columns:
+        return None
+
+    delay = pd.to_numeric(df["delay_days"], errors="coerce").to_numpy(
+        dtype=np.float64, na_value=np.nan
+    )
+    actual_date = pd.to_datetime(df["actual_date"], errors="coerce")
+    valid_delay = ~np.isnan(delay)
+
+    month_codes, month_uniques = pd.factorize(actual_date.dt.to_period("M"))
+    month_codes = month_codes.astype(np.int64)
+    # Linhas sem actual_date entram num bucket próprio, só usado sem filtro de datas.
+    month_codes[month_codes < 0] = len(month_uniques)
+    month_labels = np.append(
+        pd.PeriodIndex(month_uniques).to_timestamp().to_numpy(),
+        np.datetime64("NaT", "ns"),
+    )
+    month_size = len(month_labels)
+
+    factors = [
+        col
+        for col in df.columns
+        if col not in RESERVED_COLS
+        and (
+            df[col].dtype == "object" or isinstance(df[col].dtype, pd.CategoricalDtype)
+        )
+    ]
+    cross_columns = [col for col in df.columns if col not in NON_CROSS_COLS]
+    encoded = {col: _factorize(df[col]) for col in cross_columns}
+
+    total_frames = []
+    total_columns = []
+    for col in factors:
+        codes, labels = encoded[col]
+        mask = valid_delay & (codes >= 0)
+        result = _group_totals(
+            [codes[mask], month_codes[mask]], [len(labels), month_size], delay[mask]
+        )
+        if result is None:
+            continue
+        (value_codes, month_idx), sums, counts, group_keys = result
+
+        dates = pd.Series(actual_date.to_numpy()[mask])
+        key = codes[mask] * month_size + month_codes[mask]
+        bounds = dates.groupby(key, sort=True).agg(["min", "max"]).reindex(group_keys)
+
+        total_frames.append(
+            pd.DataFrame(
+                {
+                    "factor": col,
+                    "value": labels[value_codes],
+                    "month": month_labels[month_idx],
+                    "sum": sums,
+                    "count": counts,
+                    "min_date": bounds["min"].to_numpy(),
+                    "max_date": bounds["max"].to_numpy(),
+                }
+            )
+        )
+        total_columns.append(col)
+
+    pair_frames = []
+    pair_columns: Dict[str, List[str]] = {}
+    for col in total_columns:
+        codes, labels = encoded[col]
+        base_mask = valid_delay & (codes >= 0)
+        for other_col in cross_columns:
+            if other_col == col:
+                continue
+            other_codes, other_labels = encoded[other_col]
+            if len(other_labels) > PARETO_CROSS_MAX_CARDINALITY:
+                # O Pareto omite a coluna da análise cruzada; o par nunca seria lido.
+                continue
+            mask = base_mask & (other_codes >= 0)
+            result = _group_totals(
+                [codes[mask], other_codes[mask], month_codes[mask]],
+                [len(labels), len(other_labels), month_size],
+                delay[mask],
+            )
+            if result is None:
+                continue
+            (value_codes, other_idx, month_idx), sums, counts, _ = result
+            pair_frames.append(
+                pd.DataFrame(
+                    {
+                        "factor": col,
+                        "value": labels[value_codes],
+                        "other_factor": other_col,
+                        "other_value": other_labels[other_idx],
+                        "month": month_labels[month_idx],
+                        "sum": sums,
+                        "count": counts,
+                    }
+                )
+            )
+            pair_columns.setdefault(col, []).append(other_col)
+
+    totals = pd.concat(
+        total_frames
+        or [
+            pd.DataFrame(
+                columns=[
+                    "factor",
+                    "value",
+                    "month",
+                    "sum",
+                    "count",
+                    "min_date",
+                    "max_date",
+                ]
+            )
+        ],
+        ignore_index=True,
+    )
+    pairs = pd.concat(
+        pair_frames
+        or [
+            pd.DataFrame(
+                columns=[
+                    "factor",
+                    "value",
+                    "other_factor",
+                    "other_value",
+                    "month",
+                    "sum",
+                    "count",
+                ]
+            )
+        ],
+        ignore_index=True,
+    )
+    for frame in (totals, pairs):
+        for col in LABEL_COLS:
+            if col in frame.columns:
+                frame[col] = frame[col].astype("category")
+
+    actual_dates = actual_date.dropna()
+    meta = {
+        "version": CUBE_VERSION,
+        "source_hash": source_hash,
+        "factors": factors,
+        "cross_columns": cross_columns,
+        "total_columns": total_columns,
+        "pair_columns": pair_columns,
+        "cardinality": {col: len(encoded[col][1]) for col in cross_columns},
+        "dates_normalized": bool((actual_dates == actual_dates.dt.normalize()).all()),
+    }
+    return AggregateCube(totals, pairs, meta)
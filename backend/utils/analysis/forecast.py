@@ -1,15 +1,74 @@
 import pandas as pd
 import numpy as np
+import statsmodels.api as sm
 from statsmodels.tsa.arima.model import ARIMA
 from statsmodels.tools.sm_exceptions import ConvergenceWarning, ValueWarning
 from statsmodels.stats.diagnostic import acorr_ljungbox
+import copy
+import threading
 import warnings
-from typing import Dict, Any, Optional, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Hashable, Optional, List, Tuple
+from config import (
+    FORECAST_CACHE_MAX_ENTRIES,
+    FORECAST_CACHE_TTL,
+    FORECAST_BATCH_WORKERS,
+)
+from utils.cache import LRUCache
 from .model_evaluation import evaluate_model_significance, evaluate_model_confidence
 
 MIN_DATA_POINTS_FOR_TIMESERIES = 15
 FORECAST_PERIODS = 12
 
+_forecast_cache = LRUCache(
+    max_entries=FORECAST_CACHE_MAX_ENTRIES, ttl=FORECAST_CACHE_TTL
+)
+
+
+def forecast_cache_key(
+    content_hash: str,
+    factor_col: Optional[str] = None,
+    factor_value: Optional[str] = None,
+) -> Tuple[Any, ...]:
+    if not (factor_col and factor_value):
+        factor_col, factor_value = None, None
+    # As datas previstas partem do mês seguinte; a virada do mês invalida a entrada.
+    forecast_start = _generate_forecast_dates()[0].strftime("%Y-%m")
+    return (
+        content_hash,
+        factor_col,
+        str(factor_value) if factor_value else None,
+        forecast_start,
+    )
+
+
+_batch_executor = None
+_batch_executor_lock = threading.Lock()
+
+
+def _get_batch_executor() -> ProcessPoolExecutor:
+    global _batch_executor
+    with _batch_executor_lock:
+        if _batch_executor is None:
+            _batch_executor = ProcessPoolExecutor(max_workers=FORECAST_BATCH_WORKERS)
+        return _batch_executor
+
+
+def _reset_batch_executor() -> None:
+    global _batch_executor
+    with _batch_executor_lock:
+        if _batch_executor is not None:
+            _batch_executor.shutdown(wait=False, cancel_futures=True)
+        _batch_executor = None
+
+
+def get_cached_forecast(cache_key: Optional[Hashable]) -> Optional[Dict[str, Any]]:
+    if cache_key is None:
+        return None
+    result = _forecast_cache.get(cache_key)
+    return copy.deepcopy(result) if result is not None else None
+
 
 def _prepare_time_series_data(
     df: pd.DataFrame,
@@ -139,46 +198,70 @@ def _run_arma_model(
         return result
 
 
-def run_and_evaluate_forecasts(df: pd.DataFrame) -> Dict[str, Any]:
-
-    df_monthly, error, historical_data = _prepare_time_series_data(df)
-    if error:
-        return {"error": error, "historical": historical_data}
+def _run_glm_model(
+    df_monthly: pd.Series, forecast_dates: pd.DatetimeIndex
+) -> Dict[str, Any]:
 
-    forecast_dates = _generate_forecast_dates()
-    arma_result = _run_arma_model(df_monthly, forecast_dates)
+    result = {
+        "forecast": [],
+        "ci_lower": [],
+        "ci_upper": [],
+        "model_used": "GLM",
+        "aic": None,
+        "warning": None,
+        "pvalues": {},
+    }
 
     try:
-        import statsmodels.api as sm
-
-        X = sm.add_constant(np.arange(len(df_monthly)))
-        glm_model = sm.GLM(df_monthly.values, X, family=sm.families.Gaussian()).fit()
-
-        Xf = sm.add_constant(
-            np.arange(len(df_monthly), len(df_monthly) + len(forecast_dates))
+        n = len(df_monthly)
+        X = pd.DataFrame({"const": 1.0, "trend": np.arange(n, dtype=float)})
+        glm_model = sm.GLM(
+            df_monthly.to_numpy(), X, family=sm.families.Gaussian()
+        ).fit()
+
+        Xf = pd.DataFrame(
+            {"const": 1.0, "trend": np.arange(n, n + len(forecast_dates), dtype=float)}
         )
         pred = glm_model.get_prediction(Xf)
-        glm_forecast = pred.predicted_mean.tolist()
         ci_glm = pred.conf_int(alpha=0.05)
-        glm_ci_lower = ci_glm.iloc[:, 0].tolist()
-        glm_ci_upper = ci_glm.iloc[:, 1].tolist()
-        glm_result = {
-            "forecast": glm_forecast,
-            "ci_lower": glm_ci_lower,
-            "ci_upper": glm_ci_upper,
-            "model_used": "GLM",
-            "aic": getattr(glm_model, "aic", None),
-            "warning": None,
-        }
+        result["forecast"] = np.asarray(pred.predicted_mean).tolist()
+        result["ci_lower"] = np.asarray(ci_glm)[:, 0].tolist()
+        result["ci_upper"] = np.asarray(ci_glm)[:, 1].tolist()
+        result["aic"] = getattr(glm_model, "aic", None)
+        try:
+            result["pvalues"] = glm_model.pvalues.to_dict()
+        except Exception:
+            result["pvalues"] = {}
+        return result
+
     except Exception:
-        glm_result = {
-            "forecast": [],
-            "ci_lower": [],
-            "ci_upper": [],
-            "model_used": "GLM",
-            "aic": None,
-            "warning": "Fallback GLM falhou",
-        }
+        result["warning"] = "Fallback GLM falhou"
+        return result
+
+
+def run_and_evaluate_forecasts(
+    df: pd.DataFrame, cache_key: Optional[Hashable] = None
+) -> Dict[str, Any]:
+
+    cached = get_cached_forecast(cache_key)
+    if cached is not None:
+        return cached
+
+    result = _evaluate_forecasts(df)
+    if cache_key is not None:
+        _forecast_cache.put(cache_key, copy.deepcopy(result))
+    return result
+
+
+def _evaluate_forecasts(df: pd.DataFrame) -> Dict[str, Any]:
+
+    df_monthly, error, historical_data = _prepare_time_series_data(df)
+    if error:
+        return {"error": error, "historical": historical_data}
+
+    forecast_dates = _generate_forecast_dates()
+    arma_result = _run_arma_model(df_monthly, forecast_dates)
+    glm_result = _run_glm_model(df_monthly, forecast_dates)
 
     if arma_result.get("error"):
         best = glm_result
@@ -209,27 +292,7 @@ def run_and_evaluate_forecasts(df: pd.DataFrame) -> Dict[str, Any]:
 
     pvals = best.get("pvalues", {})
     if pvals:
-
-        if best.get("model_used") == "ARMA":
-            significant, significance_desc, pvals = evaluate_model_significance(pvals)
-        else:
-
-            try:
-                X = sm.add_constant(np.arange(len(df_monthly)))
-                glm_model = sm.GLM(
-                    df_monthly.values, X, family=sm.families.Gaussian()
-                ).fit()
-                pvals = glm_model.pvalues.to_dict()
-                significant, significance_desc, pvals = evaluate_model_significance(
-                    pvals
-                )
-            except Exception as e:
-
-                significant = False
-                significance_desc = (
-                    "Não foi possível calcular p-valores para o modelo GLM."
-                )
-                pvals = {}
+        significant, significance_desc, pvals = evaluate_model_significance(pvals)
     else:
         significant = False
         significance_desc = "Sem p-valores disponíveis."
@@ -276,3 +339,42 @@ def run_and_evaluate_forecasts(df: pd.DataFrame) -> Dict[str, Any]:
             "significance_desc": significance_desc,
         },
     }
+
+
+def run_forecasts_batch(
+    frames: Dict[Hashable, pd.DataFrame],
+    cache_keys: Optional[Dict[Hashable, Hashable]] = None,
+) -> Dict[Hashable, Dict[str, Any]]:
+
+    cache_keys = cache_keys or {}
+    results: Dict[Hashable, Dict[str, Any]] = {}
+    pending = {}
+    for group, frame in frames.items():
+        cached = get_cached_forecast(cache_keys.get(group))
+        if cached is not None:
+            results[group] = cached
+        else:
+            pending[group] = frame[["actual_date", "delay_days"]]
+
+    computed: Dict[Hashable, Dict[str, Any]] = {}
+    if len(pending) > 1 and FORECAST_BATCH_WORKERS > 1:
+        try:
+            executor = _get_batch_executor()
+            futures = {
+                group: executor.submit(_evaluate_forecasts, frame)
+                for group, frame in pending.items()
+            }
+            computed = {group: future.result() for group, future in futures.items()}
+        except BrokenProcessPool:
+            _reset_batch_executor()
+            computed = {}
+
+    for group, frame in pending.items():
+        result = computed.get(group)
+        if result is None:
+            result = _evaluate_forecasts(frame)
+        if cache_keys.get(group) is not None:
+            _forecast_cache.put(cache_keys[group], copy.deepcopy(result))
+        results[group] = result
+
+    return {group: results[group] for group in frames}
@@ -1,5 +1,8 @@
+import copy
 import pandas as pd
-from typing import Dict, Any
+from typing import Dict, Any, Hashable, Optional
+from config import FORECAST_CACHE_MAX_ENTRIES, FORECAST_CACHE_TTL
+from utils.cache import LRUCache
 from .analysis import (
     calculate_delay_statistics,
     perform_factor_analysis,
@@ -11,15 +14,27 @@ RESERVED_COLS = ["estimated_date", "actual_date", "delay_days"]
 MIN_DATA_POINTS_FOR_TIMESERIES = 15
 FORECAST_PERIODS = 12
 
+# Mesma chave e validade da previsão (hash do parquet processado e mês inicial).
+_analysis_cache = LRUCache(
+    max_entries=FORECAST_CACHE_MAX_ENTRIES, ttl=FORECAST_CACHE_TTL
+)
+
+
+def get_cached_analysis(cache_key: Hashable) -> Optional[Dict[str, Any]]:
+    result = _analysis_cache.get(cache_key)
+    return copy.deepcopy(result) if result is not None else None
+
 
-def analyze_data(df: pd.DataFrame) -> Dict[str, Any]:
+def analyze_data(
+    df: pd.DataFrame, forecast_cache_key: Optional[Hashable] = None
+) -> Dict[str, Any]:
     try:
         stats, stats_err = calculate_delay_statistics(df)
         if stats_err:
             return {"error": stats_err, "delayStatistics": None}
 
         factors = perform_factor_analysis(df, stats)
-        forecast_results = run_and_evaluate_forecasts(df)
+        forecast_results = run_and_evaluate_forecasts(df, forecast_cache_key)
 
         mapped_stats = {
             "averageDelay": stats.get("mediaAtraso"),
@@ -54,7 +69,7 @@ def analyze_data(df: pd.DataFrame) -> Dict[str, Any]:
 
         mapped_insights = [i.get("descricao", "") for i in insights]
 
-        return {
+        result = {
             "delayStatistics": mapped_stats,
             "factorAnalysis": mapped_factors,
             "timeSeriesAnalysis": {
@@ -68,6 +83,9 @@ def analyze_data(df: pd.DataFrame) -> Dict[str, Any]:
             },
             "insights": mapped_insights,
         }
+        if forecast_cache_key is not None:
+            _analysis_cache.put(forecast_cache_key, copy.deepcopy(result))
+        return result
 
     except Exception as e:
         return {"error": str(e)}
@@ -1,14 +1,112 @@
 import pandas as pd
+import codecs
 import io
-import re
+import os
 import csv
-from typing import List, Dict, Any, Generator
-import chardet
+from typing import List, Dict, Any, Generator, BinaryIO, Optional, Union
+from chardet.universaldetector import UniversalDetector
+
+SAMPLE_SIZE = 64 * 1024
+ENCODING_STRIDE_SAMPLES = 4
+ENCODING_STRIDE_BLOCK_SIZE = 16 * 1024
+ENCODING_FEED_SIZE = 4 * 1024
+
+
+class EmptyFileError(ValueError):
+    """Arquivo sem cabeçalho ou sem linhas de dados: erro do envio, não do servidor."""
+
+
+_BOMS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+
+def _is_strict_utf8(block: bytes, truncated: bool) -> bool:
+    if truncated:
+        # Blocos amostrados no meio do arquivo podem cortar um caractere
+        # multibyte nas bordas; descarta bytes de continuação iniciais.
+        start = 0
+        while start < min(3, len(block)) and 0x80 <= block[start] <= 0xBF:
+            start += 1
+        block = block[start:]
+    try:
+        block.decode("utf-8", errors="strict")
+        return True
+    except UnicodeDecodeError as e:
+        return (
+            truncated
+            and e.reason == "unexpected end of data"
+            and e.start >= len(block) - 3
+        )
+
+
+def _sample_blocks(stream: BinaryIO) -> List[bytes]:
+    position = stream.tell()
+    blocks = [stream.read(SAMPLE_SIZE)]
+    try:
+        total_size = stream.seek(0, io.SEEK_END)
+        remaining = total_size - position - SAMPLE_SIZE
+        if remaining > ENCODING_STRIDE_BLOCK_SIZE * ENCODING_STRIDE_SAMPLES:
+            stride = remaining // ENCODING_STRIDE_SAMPLES
+            for i in range(1, ENCODING_STRIDE_SAMPLES + 1):
+                stream.seek(
+                    position + SAMPLE_SIZE + stride * i - ENCODING_STRIDE_BLOCK_SIZE
+                )
+                blocks.append(stream.read(ENCODING_STRIDE_BLOCK_SIZE))
+    finally:
+        stream.seek(position)
+    return blocks
+
+
+def detect_encoding_info(blocks: List[bytes]) -> Dict[str, Any]:
+    prefix = blocks[0] if blocks else b""
+    for bom, encoding in _BOMS:
+        if prefix.startswith(bom):
+            return {"encoding": encoding, "strategy": "bom", "confidence": 1.0}
+
+    if all(
+        _is_strict_utf8(block, truncated=i > 0 or len(prefix) >= SAMPLE_SIZE)
+        for i, block in enumerate(blocks)
+    ):
+        return {"encoding": "utf-8", "strategy": "utf8", "confidence": 1.0}
+
+    detector = UniversalDetector()
+    for block in blocks:
+        for offset in range(0, len(block), ENCODING_FEED_SIZE):
+            detector.feed(block[offset : offset + ENCODING_FEED_SIZE])
+            if detector.done:
+                break
+        if detector.done:
+            break
+    detector.close()
+
+    encoding = detector.result.get("encoding")
+    if not encoding:
+        return {"encoding": "utf-8", "strategy": "default", "confidence": 0.0}
+    if encoding.lower() == "ascii":
+        encoding = "utf-8"
+    return {
+        "encoding": encoding,
+        "strategy": "chardet",
+        "confidence": round(float(detector.result.get("confidence") or 0.0), 4),
+    }
+
+
+def sniff_encoding(source: Union[bytes, str, os.PathLike, BinaryIO]) -> Dict[str, Any]:
+    stream = _open_source(source)
+    try:
+        return detect_encoding_info(_sample_blocks(stream))
+    finally:
+        if stream is not source:
+            stream.close()
 
 
 def detect_encoding(file_content: bytes) -> str:
-    result = chardet.detect(file_content)
-    return result["encoding"] or "utf-8"
+    return detect_encoding_info([file_content[:SAMPLE_SIZE]])["encoding"]
 
 
 def detect_delimiter(sample: str) -> str:
@@ -22,58 +120,99 @@ def detect_delimiter(sample: str) -> str:
 
 
 def process_chunk(chunk: pd.DataFrame) -> List[Dict[str, Any]]:
+    for col in chunk.select_dtypes(include=["timedelta64"]).columns:
+        chunk[col] = chunk[col].astype(str).where(chunk[col].notna())
+    for col in chunk.select_dtypes(include=["integer"]).columns:
+        chunk[col] = pd.to_numeric(chunk[col], downcast="integer")
     for col in chunk.select_dtypes(include=["float64"]).columns:
-        chunk[col] = chunk[col].astype("float32")
-    for col in chunk.select_dtypes(include=["int64"]).columns:
-        chunk[col] = chunk[col].astype("int32")
-    for col in chunk.select_dtypes(include=["datetime64"]).columns:
+        downcast = chunk[col].astype("float32")
+        if (downcast.astype("float64") == chunk[col]).sum() == chunk[col].count():
+            chunk[col] = downcast
+    for col in chunk.select_dtypes(include=["datetime", "datetimetz"]).columns:
         chunk[col] = chunk[col].dt.strftime("%Y-%m-%d")
 
-    records = chunk.to_dict("records")
-    for record in records:
-        for key, value in record.items():
-            if pd.isna(value):
-                record[key] = None
-            elif isinstance(value, (pd.Timestamp, pd.Timedelta)):
-                record[key] = str(value)
-    return records
+    return chunk.astype(object).where(chunk.notna(), None).to_dict("records")
 
 
-def parse_csv(
-    file_content: bytes, chunk_size: int = 10000
-) -> Generator[List[Dict[str, Any]], None, None]:
-    encoding = detect_encoding(file_content)
+def _open_source(source: Union[bytes, str, os.PathLike, BinaryIO]) -> BinaryIO:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, "rb")
+    return source
 
-    try:
-        content = file_content.decode(encoding)
-    except UnicodeDecodeError:
-        content = file_content.decode("utf-8", errors="replace")
 
-    content = content.strip().lstrip("\ufeff")
-    if not content:
-        raise ValueError("Arquivo CSV vazio")
+def _read_sample(stream: BinaryIO, size: int = SAMPLE_SIZE) -> bytes:
+    position = stream.tell()
+    sample = stream.read(size)
+    stream.seek(position)
+    return sample
 
-    lines = re.split(r"\r\n|\r|\n", content)
-    lines = [line for line in lines if line.strip()]
 
-    if len(lines) <= 1:
-        raise ValueError("CSV contém apenas o cabeçalho ou está mal formatado")
+def iter_csv_chunks(
+    source: Union[bytes, str, os.PathLike, BinaryIO],
+    chunk_size: int = 10000,
+    engine: str = "c",
+    encoding: Optional[str] = None,
+    usecols: Optional[List[str]] = None,
+) -> Generator[pd.DataFrame, None, None]:
+    stream = _open_source(source)
+    try:
+        sample = _read_sample(stream)
+        if not sample.strip():
+            raise EmptyFileError("Arquivo CSV vazio")
+
+        if encoding is None:
+            encoding = detect_encoding_info(_sample_blocks(stream))["encoding"]
+
+        sample_text = sample.decode(encoding, errors="replace").lstrip("\ufeff")
+        sample_lines = [line for line in sample_text.splitlines() if line.strip()]
+        if not sample_lines:
+            raise EmptyFileError("Arquivo CSV vazio")
+
+        delimiter = detect_delimiter(sample_lines[0])
+
+        try:
+            reader = pd.read_csv(
+                stream,
+                delimiter=delimiter,
+                encoding=encoding,
+                encoding_errors="replace",
+                engine=engine,
+                on_bad_lines="warn",
+                chunksize=chunk_size,
+                usecols=(lambda col: col in usecols) if usecols else None,
+            )
+            has_rows = False
+            for chunk in reader:
+                if chunk.empty:
+                    continue
+                has_rows = True
+                yield chunk
+        except Exception as e:
+            raise ValueError(f"Erro ao ler CSV: {str(e)}")
+
+        if not has_rows:
+            raise EmptyFileError("CSV contém apenas o cabeçalho ou está mal formatado")
+    finally:
+        if stream is not source:
+            stream.close()
 
-    delimiter = detect_delimiter(lines[0])
 
-    try:
-        csv_io = io.StringIO(content, newline=None)
-        reader = pd.read_csv(
-            csv_io,
-            delimiter=delimiter,
-            encoding=encoding,
-            engine="python",
-            on_bad_lines="warn",
-            chunksize=chunk_size,
-        )
-        for chunk in reader:
-            records = process_chunk(chunk)
-            yield records
+def parse_csv(
+    source: Union[bytes, str, os.PathLike, BinaryIO],
+    chunk_size: int = 10000,
+    engine: str = "c",
+    encoding: Optional[str] = None,
+) -> Generator[List[Dict[str, Any]], None, None]:
+    for chunk in iter_csv_chunks(source, chunk_size, engine, encoding):
+        yield process_chunk(chunk)
+
 
-    except Exception as e:
-        raise ValueError(f"Erro ao ler CSV: {str(e)}")
+def read_csv_dataframe(
+    source: Union[bytes, str, os.PathLike, BinaryIO],
+    usecols: Optional[List[str]] = None,
+    chunk_size: int = 100000,
+) -> pd.DataFrame:
+    chunks = list(iter_csv_chunks(source, chunk_size=chunk_size, usecols=usecols))
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
@@ -1,45 +1,277 @@
+import re
+import warnings
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Any
+from pandas.tseries.api import guess_datetime_format
+from typing import List, Dict, Any, Union
 
+TYPE_SAMPLE_ROWS = 1000
+NUMERIC_MIN_PARSE_RATIO = 0.95
+DATE_MIN_PARSE_RATIO = 0.9
+FACTOR_MAX_DISTINCT = 100
+# Tentados quando guess_datetime_format não reconhece o valor (ano com dois
+# dígitos, mês abreviado).
+DATE_FORMATS = (
+    "%Y-%m-%d",
+    "%Y-%m-%d %H:%M:%S",
+    "%d/%m/%Y",
+    "%m/%d/%Y",
+    "%d/%m/%y",
+    "%d-%m-%Y",
+    "%d.%m.%Y",
+    "%Y/%m/%d",
+    "%d-%b-%y",
+    "%d-%b-%Y",
+    "%d %b %Y",
+    "%b %d, %Y",
+)
+# Todo valor que algum formato de data converte tem dois grupos de dígitos
+# separados ("05/01/2022", "Jan 5, 2022", "05-Jan-22") ou oito seguidos.
+DATE_LIKE_PATTERN = re.compile(r"\d{1,4}\D{1,5}\d{1,4}|\d{8}")
+ESTIMATED_DATE_HINTS = (
+    "estim",
+    "previs",
+    "schedul",
+    "planned",
+    "expected",
+    "promised",
+    "prazo",
+    "agend",
+    "due",
+    "eta",
+)
+ACTUAL_DATE_HINTS = (
+    "actual",
+    "real",
+    "deliver",
+    "entreg",
+    "receb",
+    "receiv",
+    "arriv",
+    "chegada",
+    "conclu",
+)
+DELAY_HINTS = ("delay", "atraso", "late", "lead time", "leadtime")
+# "id" como palavra ("ID", "pedido_id") ou sufixo em camelCase ("orderId").
+ID_NAME_PATTERN = re.compile(
+    r"(?<![A-Za-z])(?:id|Id|ID)(?![A-Za-z])|(?<=[a-z])Id(?![a-z])"
+)
 
-def infer_column_types(data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    if not data:
-        return []
 
-    sample_row = data[0]
-    columns = []
+def _to_str(series: pd.Series) -> pd.Series:
+    return series.astype(str).where(series.notna())
 
-    for key, value in sample_row.items():
-        col_type = "string"
 
-        if isinstance(value, (int, float)):
-            col_type = (
-                "string" if "id" in key.lower() or len(str(value)) > 10 else "number"
-            )
-        elif isinstance(value, bool):
-            col_type = "boolean"
-        elif isinstance(value, str):
-            col_type = "string"
-
-        columns.append(
-            {
-                "name": key,
-                "label": key.replace("_", " ").replace(".", " ").title(),
-                "type": col_type,
-                "selected": False,
-            }
+def _to_category(series: pd.Series) -> pd.Series:
+    values = _to_str(series)
+    categories = sorted(values.dropna().unique())
+    return pd.Series(pd.Categorical(values, categories=categories), index=series.index)
+
+
+def factor_equals(
+    series: pd.Series, value: Any, case_insensitive: bool = False
+) -> pd.Series:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories.astype(str)
+        target = str(value)
+        if case_insensitive:
+            matches = categories.str.lower() == target.lower()
+        else:
+            matches = categories == target
+        codes = np.flatnonzero(matches)
+        return pd.Series(
+            np.isin(series.cat.codes.to_numpy(), codes), index=series.index
         )
+    if case_insensitive and series.dtype == "object":
+        return series.astype(str).str.lower() == str(value).lower()
+    return series == value
+
+
+def _spread_sample(data, limit: int):
+    step = max(len(data) // limit, 1)
+    if isinstance(data, pd.DataFrame):
+        return data.iloc[::step].iloc[:limit]
+    return pd.DataFrame(data[::step][:limit])
+
+
+def _has_hint(name: str, hints) -> bool:
+    lowered = name.lower()
+    return any(hint in lowered for hint in hints)
+
+
+def _date_parse_ratio(text: pd.Series) -> float:
+    """Fração dos valores que um único formato de data converte.
+
+    Para no primeiro formato que chega a DATE_MIN_PARSE_RATIO. Se nenhum dos
+    primeiros valores tem cara de data (DATE_LIKE_PATTERN), nem tenta converter.
+    """
+    head = text.head(20)
+    if not head.str.contains(DATE_LIKE_PATTERN).any():
+        return 0.0
+
+    guessed = []
+    with warnings.catch_warnings():
+        # dayfirst=True em datas ISO só avisa; o formato errado perde na contagem.
+        warnings.simplefilter("ignore")
+        for value in head.head(5):
+            for dayfirst in (False, True):
+                fmt = guess_datetime_format(value, dayfirst=dayfirst)
+                if fmt and fmt not in guessed:
+                    guessed.append(fmt)
+            if guessed:
+                break
+
+    best = 0.0
+    for fmt in guessed + [fmt for fmt in DATE_FORMATS if fmt not in guessed]:
+        # Os primeiros valores descartam os formatos fixos que não servem antes
+        # da amostra toda.
+        if fmt not in guessed and (
+            pd.to_datetime(head, format=fmt, errors="coerce").isna().all()
+        ):
+            continue
+        ratio = pd.to_datetime(text, format=fmt, errors="coerce").notna().mean()
+        best = max(best, float(ratio))
+        if best >= DATE_MIN_PARSE_RATIO:
+            break
+    return best
+
 
-    return columns
+def _profile_column(name: str, values: pd.Series) -> Dict[str, Any]:
+    if values.dtype == object:
+        values = values.where(values.astype(str).str.strip() != "")
+    non_null = values.dropna()
+    profile = {
+        "type": "string",
+        "fit": 0.0,
+        "fill": 0.0,
+        "distinct": 0.0,
+        "cardinality": 0,
+        "identifier": False,
+    }
+    if non_null.empty:
+        return profile
+    profile["fill"] = len(non_null) / len(values)
+
+    kind = pd.api.types.infer_dtype(non_null, skipna=True)
+    numbers = None
+    if kind == "boolean":
+        profile.update(type="boolean", fit=1.0)
+    elif kind in ("datetime64", "datetime", "date"):
+        profile.update(type="date", fit=1.0)
+    elif kind in ("integer", "floating", "mixed-integer-float", "decimal"):
+        numbers = pd.to_numeric(non_null, errors="coerce").dropna()
+        profile.update(type="number", fit=1.0)
+    else:
+        parsed = pd.to_numeric(non_null, errors="coerce")
+        numeric_ratio = float(parsed.notna().mean())
+        if numeric_ratio >= NUMERIC_MIN_PARSE_RATIO:
+            numbers = parsed.dropna()
+            profile.update(type="number", fit=numeric_ratio)
+        else:
+            date_ratio = _date_parse_ratio(non_null.astype(str).str.strip())
+            if date_ratio >= DATE_MIN_PARSE_RATIO:
+                profile.update(type="date", fit=date_ratio)
+            else:
+                profile["fit"] = 1.0 - max(numeric_ratio, date_ratio)
+
+    distinct = non_null.astype(str).nunique()
+    profile["distinct"] = distinct / len(non_null)
+    profile["cardinality"] = distinct
+
+    integer_like = numbers is not None and bool((numbers % 1 == 0).all())
+    named_id = bool(ID_NAME_PATTERN.search(name))
+    if integer_like and (named_id or numbers.abs().max() >= 1e10):
+        # Códigos numéricos (ids, CNPJ, pedidos) não são medidas.
+        profile["type"] = "string"
+    profile["identifier"] = named_id or (
+        profile["type"] != "date"
+        and len(non_null) >= 20
+        and profile["distinct"] >= 0.95
+        and (integer_like or profile["type"] == "string")
+    )
+    return profile
+
+
+def _suggest_roles(profiles: List[Dict[str, Any]]) -> None:
+    for profile in profiles:
+        base = profile["fit"] * profile["fill"]
+        profile["role"], profile["confidence"] = None, base
+        if profile["identifier"] or not base:
+            continue
+        if profile["type"] == "date":
+            if _has_hint(profile["name"], ESTIMATED_DATE_HINTS):
+                profile["candidate"] = "estimatedDate"
+            elif _has_hint(profile["name"], ACTUAL_DATE_HINTS):
+                profile["candidate"] = "actualDate"
+        elif profile["type"] == "number" and _has_hint(profile["name"], DELAY_HINTS):
+            profile["candidate"] = "delay"
+        elif profile["cardinality"] <= FACTOR_MAX_DISTINCT and (
+            profile["distinct"] <= 0.5 or profile["cardinality"] <= 2
+        ):
+            profile["role"] = "factor"
+            profile["confidence"] = base * (1 - profile["distinct"] / 2)
+
+    # Um papel de data ou de atraso por arquivo: fica a coluna mais confiável.
+    for role in ("estimatedDate", "actualDate", "delay"):
+        candidates = [p for p in profiles if p.get("candidate") == role]
+        if candidates:
+            max(candidates, key=lambda p: p["confidence"])["role"] = role
+    # Datas sem nome reconhecível ocupam os papéis que sobraram, em ordem.
+    taken = {p["role"] for p in profiles}
+    for profile in profiles:
+        if profile["type"] == "date" and profile["role"] is None:
+            free = [r for r in ("estimatedDate", "actualDate") if r not in taken]
+            if "candidate" not in profile and free and not profile["identifier"]:
+                profile["role"] = free[0]
+                profile["confidence"] *= 0.5
+                taken.add(free[0])
+
+
+def infer_column_types(
+    data: Union[List[Dict[str, Any]], pd.DataFrame],
+) -> List[Dict[str, Any]]:
+    """Tipo e papel sugerido de cada coluna, a partir de uma amostra do primeiro bloco.
+
+    Usa no máximo TYPE_SAMPLE_ROWS linhas espalhadas pelo bloco. `confidence`
+    é a fração da amostra compatível com o tipo, descontados os nulos e a
+    incerteza da sugestão de papel.
+    """
+    if data is None or len(data) == 0:
+        return []
+
+    sample = _spread_sample(data, TYPE_SAMPLE_ROWS)
+    profiles = []
+    for key in sample.columns:
+        profile = _profile_column(str(key), sample[key])
+        profile["name"] = key
+        profiles.append(profile)
+    _suggest_roles(profiles)
+
+    return [
+        {
+            "name": p["name"],
+            "label": str(p["name"]).replace("_", " ").replace(".", " ").title(),
+            "type": p["type"],
+            "selected": False,
+            "suggestedRole": p["role"],
+            "confidence": round(float(p["confidence"]), 2),
+        }
+        for p in profiles
+    ]
 
 
 def prepare_data(
-    dataset: List[Dict[str, Any]], columns_info: List[Dict[str, Any]]
+    dataset: Union[List[Dict[str, Any]], pd.DataFrame],
+    columns_info: List[Dict[str, Any]],
 ) -> pd.DataFrame:
-    if not dataset:
+    if isinstance(dataset, pd.DataFrame):
+        if dataset.empty:
+            return pd.DataFrame()
+        df = dataset
+    elif not dataset:
         return pd.DataFrame()
-
-    df = pd.DataFrame(dataset)
+    else:
+        df = pd.DataFrame(dataset)
     rename_map = {}
     date_cols_to_convert = []
     factor_cols_original = []
@@ -109,9 +341,9 @@ def prepare_data(
                     if (df[col_name].dropna() % 1 == 0).all():
                         df[col_name] = df[col_name].astype("Int64")
                 except Exception:
-                    df[col_name] = df[col_name].astype(str)
+                    df[col_name] = _to_category(df[col_name])
             else:
-                df[col_name] = df[col_name].astype(str)
+                df[col_name] = _to_category(df[col_name])
 
     final_columns = list(rename_map.values())
     final_columns.extend([f for f in factor_cols_original if f not in rename_map])
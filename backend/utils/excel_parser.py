@@ -0,0 +1,169 @@
+import pandas as pd
+from typing import Any, Dict, Generator, Iterator, List, Optional, Tuple, Union
+from utils.csv_parser import EmptyFileError, process_chunk
+
+try:
+    import xlrd
+except ImportError:
+    xlrd = None
+
+XLSX_MAGIC = b"PK\x03\x04"
+XLS_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+EXCEL_FORMATS = ("xlsx", "xls")
+
+
+class UnsupportedFormatError(ValueError):
+    """Formato reconhecido, mas sem leitor instalado."""
+
+
+def detect_file_format(source: Union[str, bytes]) -> str:
+    """Formato pela assinatura do arquivo (caminho ou bytes iniciais), não pela extensão.
+
+    Exportações em texto salvas como .xls continuam indo para o leitor de CSV.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        head = bytes(source[: len(XLS_MAGIC)])
+    else:
+        with open(source, "rb") as f:
+            head = f.read(len(XLS_MAGIC))
+    if head.startswith(XLSX_MAGIC):
+        return "xlsx"
+    if head.startswith(XLS_MAGIC):
+        return "xls"
+    return "csv"
+
+
+def _iter_xlsx_sheets(file_path: str) -> Iterator[Tuple[str, Iterator[tuple]]]:
+    from openpyxl import load_workbook
+
+    # Aberto como arquivo: o conteúdo enviado é gravado pelo hash, sem extensão,
+    # e o openpyxl recusa caminhos sem .xlsx.
+    with open(file_path, "rb") as f:
+        # read_only: as linhas são lidas do XML sob demanda, sem carregar a planilha.
+        workbook = load_workbook(f, read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                yield sheet.title, sheet.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+
+def _iter_xls_sheets(file_path: str) -> Iterator[Tuple[str, Iterator[tuple]]]:
+    if xlrd is None:
+        raise UnsupportedFormatError("Leitura de arquivos .xls requer o pacote xlrd")
+
+    def rows(book, sheet):
+        for i in range(sheet.nrows):
+            yield tuple(
+                (
+                    xlrd.xldate_as_datetime(cell.value, book.datemode)
+                    if cell.ctype == xlrd.XL_CELL_DATE
+                    else (
+                        None
+                        if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK)
+                        else cell.value
+                    )
+                )
+                for cell in sheet.row(i)
+            )
+
+    book = xlrd.open_workbook(file_path, on_demand=True)
+    try:
+        for sheet in book.sheets():
+            yield sheet.name, rows(book, sheet)
+    finally:
+        book.release_resources()
+
+
+def _header(row: tuple) -> List[str]:
+    names = []
+    for i, value in enumerate(row):
+        name = str(value).strip() if value is not None else ""
+        name = name or f"Unnamed: {i}"
+        base, k = name, 1
+        while name in names:
+            name = f"{base}.{k}"
+            k += 1
+        names.append(name)
+    return names
+
+
+def _to_frame(rows: List[tuple], header: List[str]) -> pd.DataFrame:
+    width = len(header)
+    rows = [row[:width] + (None,) * (width - len(row)) for row in rows]
+    return pd.DataFrame.from_records(rows, columns=header).infer_objects()
+
+
+def iter_excel_chunks(
+    file_path: str,
+    chunk_size: int = 10000,
+    usecols: Optional[List[str]] = None,
+    file_format: Optional[str] = None,
+) -> Generator[pd.DataFrame, None, None]:
+    """Lê a planilha em blocos de `chunk_size` linhas, no mesmo formato de iter_csv_chunks.
+
+    A primeira linha não vazia é o cabeçalho. Abas seguintes com o mesmo
+    cabeçalho são tratadas como continuação (exportações divididas em abas);
+    abas com outro cabeçalho são ignoradas.
+    """
+    file_format = file_format or detect_file_format(file_path)
+    sheets = (
+        _iter_xls_sheets(file_path)
+        if file_format == "xls"
+        else _iter_xlsx_sheets(file_path)
+    )
+
+    header = None
+    has_rows = False
+    try:
+        for _, rows in sheets:
+            sheet_header = None
+            buffer = []
+            for row in rows:
+                if row is None or all(value is None or value == "" for value in row):
+                    continue
+                if sheet_header is None:
+                    sheet_header = _header(row)
+                    if header is None:
+                        header = sheet_header
+                    elif sheet_header != header:
+                        break
+                    continue
+                buffer.append(tuple(row))
+                if len(buffer) >= chunk_size:
+                    has_rows = True
+                    chunk = _to_frame(buffer, header)
+                    yield (
+                        chunk[[c for c in header if c in usecols]] if usecols else chunk
+                    )
+                    buffer = []
+            if buffer and sheet_header == header:
+                has_rows = True
+                chunk = _to_frame(buffer, header)
+                yield chunk[[c for c in header if c in usecols]] if usecols else chunk
+    finally:
+        sheets.close()
+
+    if header is None:
+        raise EmptyFileError("Planilha vazia")
+    if not has_rows:
+        raise EmptyFileError("Planilha contém apenas o cabeçalho")
+
+
+def parse_excel(
+    file_path: str, chunk_size: int = 10000, file_format: Optional[str] = None
+) -> Generator[List[Dict[str, Any]], None, None]:
+    for chunk in iter_excel_chunks(file_path, chunk_size, file_format=file_format):
+        yield process_chunk(chunk)
+
+
+def read_excel_dataframe(
+    file_path: str,
+    usecols: Optional[List[str]] = None,
+    chunk_size: int = 100000,
+    file_format: Optional[str] = None,
+) -> pd.DataFrame:
+    chunks = list(
+        iter_excel_chunks(file_path, chunk_size, usecols, file_format=file_format)
+    )
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
@@ -1,7 +1,62 @@
+import hashlib
+import json
 import os
+import tempfile
 import time
 from werkzeug.utils import secure_filename
 from flask import current_app
+from config import (
+    MAX_FILE_SIZE,
+    UPLOAD_BLOCK_SIZE,
+    UPLOAD_HEAD_SIZE,
+    UPLOAD_CONVERT_CHUNK_ROWS,
+    PROCESSED_CACHE_MAX_BYTES,
+    PROCESSED_CACHE_MAX_ENTRIES,
+    PROCESSED_ROW_GROUP_SIZE,
+    PREDICTION_INDEX_CACHE_MAX_BYTES,
+)
+from utils.cache import LRUCache
+
+
+def _dataframe_nbytes(df) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+# Chave: (id do resultado processado, mtime_ns) — uma regravação do parquet
+# invalida a entrada. Uploads com o mesmo conteúdo e os mesmos papéis de coluna
+# compartilham o mesmo id (ver get_processed_id).
+_processed_cache = LRUCache(
+    max_bytes=PROCESSED_CACHE_MAX_BYTES,
+    max_entries=PROCESSED_CACHE_MAX_ENTRIES,
+    sizeof=_dataframe_nbytes,
+)
+
+
+_processed_hashes = LRUCache(max_entries=1024)
+
+# Arquivos derivados do parquet processado (cubo do Pareto, índice de valores,
+# modelo treinado do /predict).
+# Chave: (id do resultado processado, sufixo, mtime_ns).
+_sidecar_cache = LRUCache(max_entries=PROCESSED_CACHE_MAX_ENTRIES)
+
+SIDECAR_SUFFIXES = (".cube", ".values", ".model")
+
+# Índices de casos similares do /predict, montados a partir do DataFrame em cache
+# e limitados pelo que cada um ocupa (PredictionIndex.nbytes).
+# Mesma chave do _processed_cache.
+_prediction_indexes = LRUCache(
+    max_bytes=PREDICTION_INDEX_CACHE_MAX_BYTES,
+    max_entries=PROCESSED_CACHE_MAX_ENTRIES,
+    sizeof=lambda index: index.nbytes,
+)
+
+
+def invalidate_processed_cache(file_id: str):
+    cache_id = get_processed_id(file_id)
+    _processed_cache.discard_where(lambda key: key[0] == cache_id)
+    _processed_hashes.discard_where(lambda key: key[0] == cache_id)
+    _sidecar_cache.discard_where(lambda key: key[0] == cache_id)
+    _prediction_indexes.discard_where(lambda key: key[0] == cache_id)
 
 
 def allowed_file(filename: str) -> bool:
@@ -9,62 +64,712 @@ def allowed_file(filename: str) -> bool:
     return filename.lower().endswith(tuple(allowed_extensions))
 
 
+def _temp_path(path):
+    """Arquivo temporário exclusivo ao lado de `path`, para gravar e trocar com os.replace."""
+    fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=f"{os.path.basename(path)}.", suffix=".tmp"
+    )
+    os.close(fd)
+    return temp_path
+
+
+def _read_ref(ref_path):
+    try:
+        with open(ref_path, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _write_ref(ref_path, target):
+    if target is None:
+        if os.path.exists(ref_path):
+            os.remove(ref_path)
+        return
+    temp_path = _temp_path(ref_path)
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(target)
+        os.replace(temp_path, ref_path)
+    except Exception:
+        os.remove(temp_path)
+        raise
+
+
+def _get_upload_ref_path(file_id):
+    return os.path.join(
+        current_app.config["UPLOAD_FOLDER"], f"{secure_filename(file_id)}.ref"
+    )
+
+
+def get_upload_hash(file_id: str):
+    """Hash do conteúdo enviado com este fileId, ou None (upload anterior ao mapeamento)."""
+    return _read_ref(_get_upload_ref_path(file_id))
+
+
 def save_uploaded_file(file_storage, file_id: str):
+    """Grava o upload em blocos, calculando o hash e guardando o início do arquivo.
+
+    Retorna ({path, size, contentHash, head, deduplicated}, erro); nunca há mais
+    de um bloco em memória. Passando de MAX_FILE_SIZE, o arquivo parcial é
+    removido. O conteúdo fica gravado uma vez por hash: reenviar o mesmo arquivo
+    só cria o mapeamento do novo fileId para o hash.
+    """
+    file_path = ""
     try:
         upload_folder = current_app.config["UPLOAD_FOLDER"]
         os.makedirs(upload_folder, exist_ok=True)
-        file_path = os.path.join(upload_folder, file_id)
+        file_path = _temp_path(os.path.join(upload_folder, secure_filename(file_id)))
+        digest = hashlib.sha256()
+        head = b""
+        size = 0
         with open(file_path, "wb") as f:
-            f.write(file_storage.read())
-        return file_path, None
+            for block in iter(lambda: file_storage.stream.read(UPLOAD_BLOCK_SIZE), b""):
+                size += len(block)
+                if size > MAX_FILE_SIZE:
+                    break
+                if len(head) < UPLOAD_HEAD_SIZE:
+                    head += block[: UPLOAD_HEAD_SIZE - len(head)]
+                digest.update(block)
+                f.write(block)
+        if size > MAX_FILE_SIZE:
+            os.remove(file_path)
+            return (
+                None,
+                f"Arquivo excede o tamanho máximo de {MAX_FILE_SIZE // (1024 * 1024)} MB",
+            )
+        content_hash = digest.hexdigest()
+        content_path = os.path.join(upload_folder, content_hash)
+        deduplicated = os.path.exists(content_path)
+        if deduplicated:
+            os.remove(file_path)
+            # Renova a idade do conteúdo e da cópia em parquet para clean_old_files.
+            for path in (content_path, f"{content_path}.parquet"):
+                if os.path.exists(path):
+                    os.utime(path)
+        else:
+            os.replace(file_path, content_path)
+        file_path = ""
+        _write_ref(_get_upload_ref_path(file_id), content_hash)
+        upload = {
+            "path": content_path,
+            "size": size,
+            "contentHash": content_hash,
+            "head": head,
+            "deduplicated": deduplicated,
+        }
+        return upload, None
+    except Exception as e:
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
+        return None, str(e)
+
+
+def get_uploaded_file_path(file_id):
+    content_hash = get_upload_hash(file_id)
+    return os.path.join(
+        current_app.config["UPLOAD_FOLDER"], content_hash or secure_filename(file_id)
+    )
+
+
+def get_uploaded_parquet_path(file_id):
+    return f"{get_uploaded_file_path(file_id)}.parquet"
+
+
+def _arrow_safe(df):
+    import pandas as pd
+
+    # Células de planilha misturam tipos na mesma coluna; o parquet não aceita.
+    for col in df.columns[df.dtypes == "object"]:
+        kind = pd.api.types.infer_dtype(df[col], skipna=True)
+        if kind in ("mixed", "mixed-integer"):
+            df[col] = df[col].astype(str).where(df[col].notna())
+    return df
+
+
+def _upload_schema(chunk, overrides):
+    import pyarrow as pa
+
+    schema = pa.Schema.from_pandas(chunk, preserve_index=False).remove_metadata()
+    for i, field in enumerate(schema):
+        if field.name in overrides:
+            schema = schema.set(i, pa.field(field.name, overrides[field.name]))
+        elif pa.types.is_null(field.type) or chunk[field.name].isna().all():
+            # Coluna vazia no primeiro bloco: texto, o que os seguintes trouxerem.
+            schema = schema.set(i, pa.field(field.name, pa.string()))
+    return schema
+
+
+def _chunk_to_schema(chunk, schema):
+    """Bloco convertido para o esquema do arquivo, ou None e os tipos que cabem nele."""
+    import pandas as pd
+    import pyarrow as pa
+
+    arrays = []
+    widened = {}
+    for field in schema:
+        values = chunk[field.name]
+        if pa.types.is_string(field.type):
+            values = values.astype(str).where(values.notna())
+        try:
+            arrays.append(pa.array(values, type=field.type, from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Inteiros que ganharam decimais viram float; o resto vira texto.
+            widened[field.name] = (
+                pa.float64()
+                if pa.types.is_integer(field.type)
+                and pd.api.types.is_numeric_dtype(values)
+                else pa.string()
+            )
+    if widened:
+        return None, widened
+    return pa.Table.from_arrays(arrays, schema=schema), None
+
+
+def _write_upload_parquet(chunks, path, overrides):
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in chunks:
+            chunk = _arrow_safe(chunk)
+            if writer is None:
+                schema = _upload_schema(chunk, overrides)
+                writer = pq.ParquetWriter(path, schema)
+            table, widened = _chunk_to_schema(chunk, schema)
+            if widened:
+                return widened
+            writer.write_table(table, row_group_size=PROCESSED_ROW_GROUP_SIZE)
+        return None
+    finally:
+        chunks.close()
+        if writer is not None:
+            writer.close()
+
+
+def convert_upload_to_parquet(file_id: str, file_format=None, encoding=None):
+    """Lê o arquivo enviado em blocos e grava uma cópia tipada em parquet.
+
+    O esquema sai do primeiro bloco e os seguintes são convertidos para ele, sem
+    juntar o arquivo em memória. Se um bloco não couber (texto numa coluna que
+    começou numérica), a coluna é alargada e a conversão recomeça do início.
+    """
+    from utils.csv_parser import iter_csv_chunks
+    from utils.excel_parser import (
+        EXCEL_FORMATS,
+        detect_file_format,
+        iter_excel_chunks,
+    )
+
+    temp_path = ""
+    try:
+        file_path = get_uploaded_file_path(file_id)
+        parquet_path = get_uploaded_parquet_path(file_id)
+        file_format = file_format or detect_file_format(file_path)
+        temp_path = _temp_path(parquet_path)
+        overrides = {}
+        while True:
+            if file_format in EXCEL_FORMATS:
+                chunks = iter_excel_chunks(
+                    file_path, UPLOAD_CONVERT_CHUNK_ROWS, file_format=file_format
+                )
+            else:
+                chunks = iter_csv_chunks(
+                    file_path, UPLOAD_CONVERT_CHUNK_ROWS, encoding=encoding
+                )
+            widened = _write_upload_parquet(chunks, temp_path, overrides)
+            if not widened:
+                break
+            # Cada volta alarga ao menos uma coluna (int -> float -> texto).
+            overrides.update(widened)
+        os.replace(temp_path, parquet_path)
+        return parquet_path, None
     except Exception as e:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
         return "", str(e)
 
 
-def get_processed_file_path(file_id):
+def iter_uploaded_chunks(file_id: str, chunk_size: int = 10000, encoding=None):
+    """Linhas do arquivo enviado em blocos de registros, qualquer que seja o formato."""
+    from utils.csv_parser import parse_csv, process_chunk
+    from utils.excel_parser import EXCEL_FORMATS, detect_file_format, parse_excel
+
+    parquet_path = get_uploaded_parquet_path(file_id)
+    if os.path.exists(parquet_path):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(parquet_path, memory_map=True)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield process_chunk(batch.to_pandas())
+        return
+
+    file_path = get_uploaded_file_path(file_id)
+    file_format = detect_file_format(file_path)
+    if file_format in EXCEL_FORMATS:
+        yield from parse_excel(file_path, chunk_size, file_format=file_format)
+    else:
+        yield from parse_csv(file_path, chunk_size, encoding=encoding)
+
+
+def load_uploaded_dataframe(file_id: str, columns=None):
+    import pandas as pd
+    from utils.csv_parser import read_csv_dataframe
+    from utils.excel_parser import (
+        EXCEL_FORMATS,
+        detect_file_format,
+        read_excel_dataframe,
+    )
+
+    try:
+        file_path = get_uploaded_file_path(file_id)
+        if not os.path.exists(file_path):
+            return pd.DataFrame(), "Arquivo não encontrado no servidor."
+        parquet_path = get_uploaded_parquet_path(file_id)
+        if os.path.exists(parquet_path):
+            import pyarrow.parquet as pq
+
+            names = pq.read_schema(parquet_path).names
+            if columns:
+                columns = [col for col in names if col in columns]
+            return (
+                pd.read_parquet(parquet_path, columns=columns or None, memory_map=True),
+                None,
+            )
+        file_format = detect_file_format(file_path)
+        if file_format in EXCEL_FORMATS:
+            return (
+                read_excel_dataframe(
+                    file_path, usecols=columns, file_format=file_format
+                ),
+                None,
+            )
+        return read_csv_dataframe(file_path, usecols=columns), None
+    except Exception as e:
+        return pd.DataFrame(), str(e)
+
+
+def processed_result_key(content_hash: str, columns_info) -> str:
+    """Id do resultado processado: hash do conteúdo enviado e dos papéis das colunas."""
+    roles = [
+        [c.get("name"), c.get("role"), bool(c.get("isNumeric"))]
+        for c in columns_info
+        if c.get("role")
+    ]
+    payload = json.dumps([content_hash, roles], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _get_processed_ref_path(file_id):
     return os.path.join(
-        current_app.config["PROCESSED_FOLDER"], f"{secure_filename(file_id)}.parquet"
+        current_app.config["PROCESSED_FOLDER"], f"{secure_filename(file_id)}.ref"
     )
 
 
-def save_processed_dataframe(df, file_id: str):
+def get_processed_id(file_id: str) -> str:
+    """Id sob o qual ficam o parquet processado e os derivados deste fileId."""
+    return _read_ref(_get_processed_ref_path(file_id)) or secure_filename(file_id)
+
+
+def get_linked_result(file_id: str):
+    """Resultado para o qual o fileId aponta, ou None (id próprio)."""
+    return _read_ref(_get_processed_ref_path(file_id))
+
+
+def link_processed_result(file_id: str, result_key):
+    """Aponta o fileId para o resultado `result_key`; None volta ao id próprio."""
     try:
-        processed_file_path = get_processed_file_path(file_id)
+        processed_folder = current_app.config["PROCESSED_FOLDER"]
+        os.makedirs(processed_folder, exist_ok=True)
+        _write_ref(_get_processed_ref_path(file_id), result_key)
+        return None
+    except Exception as e:
+        return str(e)
+
+
+def _get_processed_path_for_id(processed_id):
+    return os.path.join(
+        current_app.config["PROCESSED_FOLDER"], f"{processed_id}.parquet"
+    )
+
+
+def get_processed_file_path(file_id):
+    return _get_processed_path_for_id(get_processed_id(file_id))
+
+
+def has_processed_result(result_key: str) -> bool:
+    """Se o parquet processado do resultado `result_key` já existe."""
+    return os.path.exists(_get_processed_path_for_id(result_key))
+
+
+def save_processed_dataframe(df, file_id: str, result_key=None):
+    """Grava o parquet processado sob `result_key` (ou o id próprio do fileId).
+
+    O fileId só passa a apontar para o novo resultado depois da gravação; se ela
+    falhar, continua no resultado anterior.
+    """
+    temp_path = ""
+    try:
+        processed_file_path = _get_processed_path_for_id(
+            result_key or secure_filename(file_id)
+        )
         os.makedirs(os.path.dirname(processed_file_path), exist_ok=True)
-        df.to_parquet(processed_file_path, index=False)
+        if "actual_date" in df.columns:
+            # Ordenado por data, as estatísticas de cada row group permitem
+            # descartar blocos inteiros em load_filtered_dataframe.
+            df = df.sort_values("actual_date", kind="stable", na_position="last")
+        # Outros fileIds podem estar lendo o mesmo resultado: grava ao lado e troca.
+        temp_path = _temp_path(processed_file_path)
+        df.to_parquet(
+            temp_path,
+            index=False,
+            row_group_size=PROCESSED_ROW_GROUP_SIZE,
+            write_statistics=True,
+        )
+        os.replace(temp_path, processed_file_path)
+        temp_path = ""
+        _write_ref(_get_processed_ref_path(file_id), result_key)
+        invalidate_processed_cache(file_id)
+        _save_value_index(df, file_id)
         return processed_file_path, None
     except Exception as e:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
         return "", str(e)
 
 
+def _save_value_index(df, file_id: str):
+    from utils.value_index import build_value_index
+
+    try:
+        index = build_value_index(df, get_processed_file_hash(file_id))
+    except Exception:
+        # Sem índice, /scatter-factor-values volta a varrer o parquet.
+        return
+    _save_sidecar(index, file_id, ".values")
+
+
+def _processed_cache_key(file_id: str):
+    """(id processado, mtime_ns) do parquet processado; OSError se ele não existir."""
+    processed_file_path = get_processed_file_path(file_id)
+    return get_processed_id(file_id), os.stat(processed_file_path).st_mtime_ns
+
+
+def _load_cached_dataframe(file_id: str):
+    """DataFrame compartilhado do cache e sua chave; quem chama não deve alterá-lo."""
+    import pandas as pd
+
+    processed_file_path = get_processed_file_path(file_id)
+    if not os.path.exists(processed_file_path):
+        invalidate_processed_cache(file_id)
+        return None, None
+    cache_key = _processed_cache_key(file_id)
+    df = _processed_cache.get(cache_key)
+    if df is None:
+        df = pd.read_parquet(processed_file_path)
+        invalidate_processed_cache(file_id)
+        _processed_cache.put(cache_key, df)
+    return df, cache_key
+
+
 def load_processed_dataframe(file_id: str):
     import pandas as pd
 
+    try:
+        df, _ = _load_cached_dataframe(file_id)
+        if df is None:
+            return pd.DataFrame(), "Arquivo processado não encontrado."
+        return df.copy(), None
+    except Exception as e:
+        return pd.DataFrame(), str(e)
+
+
+def load_prediction_index(file_id: str):
+    from utils.predictor import PredictionIndex
+
+    try:
+        df, cache_key = _load_cached_dataframe(file_id)
+        if df is None:
+            return None, "Arquivo processado não encontrado."
+        index = _prediction_indexes.get(cache_key)
+        if index is None:
+            index = PredictionIndex(df)
+            _prediction_indexes.put(cache_key, index)
+        return index, None
+    except Exception as e:
+        return None, str(e)
+
+
+def get_processed_columns(file_id: str):
+    import pyarrow.parquet as pq
+
     try:
         processed_file_path = get_processed_file_path(file_id)
         if not os.path.exists(processed_file_path):
+            return [], "Arquivo processado não encontrado."
+        return pq.read_schema(processed_file_path).names, None
+    except Exception as e:
+        return [], str(e)
+
+
+def _apply_row_filters(df, data_inicio, data_fim, factor_col, factor_value):
+    from utils.data_prep import factor_equals
+
+    if data_inicio:
+        df = df[df["actual_date"] >= data_inicio]
+    if data_fim:
+        df = df[df["actual_date"] <= data_fim]
+    if factor_col in df.columns and factor_value is not None:
+        df = df[factor_equals(df[factor_col], factor_value)]
+    return df
+
+
+def _pushdown_filter(schema, data_inicio, data_fim, factor_col, factor_value):
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    expression = None
+
+    def add(condition):
+        nonlocal expression
+        expression = condition if expression is None else expression & condition
+
+    if "actual_date" in schema.names:
+        date_type = schema.field("actual_date").type
+        if pa.types.is_timestamp(date_type) and date_type.tz is None:
+            for bound, is_start in ((data_inicio, True), (data_fim, False)):
+                if not bound:
+                    continue
+                try:
+                    value = pa.scalar(pd.Timestamp(bound), type=date_type)
+                except (TypeError, ValueError, pa.ArrowException):
+                    continue
+                field = ds.field("actual_date")
+                add(field >= value if is_start else field <= value)
+
+    if factor_col in schema.names and factor_value is not None:
+        factor_type = schema.field(factor_col).type
+        if pa.types.is_dictionary(factor_type):
+            factor_type = factor_type.value_type
+        if pa.types.is_string(factor_type) or pa.types.is_large_string(factor_type):
+            add(ds.field(factor_col) == str(factor_value))
+
+    return expression
+
+
+def load_filtered_dataframe(
+    file_id: str,
+    columns=None,
+    data_inicio=None,
+    data_fim=None,
+    factor_col=None,
+    factor_value=None,
+):
+    """Carrega só as colunas e linhas pedidas do parquet processado.
+
+    Sem o DataFrame completo em cache, o intervalo de `actual_date` e a igualdade
+    do fator são repassados ao leitor do pyarrow, que pula row groups inteiros.
+    """
+    import pandas as pd
+    import pyarrow.dataset as ds
+
+    try:
+        processed_file_path = get_processed_file_path(file_id)
+        if not os.path.exists(processed_file_path):
+            invalidate_processed_cache(file_id)
             return pd.DataFrame(), "Arquivo processado não encontrado."
-        df = pd.read_parquet(processed_file_path)
-        return df, None
+        cache_key = _processed_cache_key(file_id)
+        cached = _processed_cache.get(cache_key)
+
+        if cached is not None:
+            available = list(cached.columns)
+        else:
+            dataset = ds.dataset(processed_file_path, format="parquet")
+            available = dataset.schema.names
+        if columns is not None:
+            columns = [col for col in available if col in set(columns)]
+            for col in ("actual_date", factor_col):
+                if col in available and col not in columns:
+                    columns.append(col)
+
+        if cached is not None:
+            df = cached if columns is None else cached[columns]
+        else:
+            table = dataset.to_table(
+                columns=columns,
+                filter=_pushdown_filter(
+                    dataset.schema, data_inicio, data_fim, factor_col, factor_value
+                ),
+            )
+            df = table.to_pandas()
+
+        # Os filtros são reaplicados em pandas para manter a semântica exata.
+        df = _apply_row_filters(df, data_inicio, data_fim, factor_col, factor_value)
+        return df.copy(), None
     except Exception as e:
         return pd.DataFrame(), str(e)
 
 
+def get_processed_file_hash(file_id: str):
+    try:
+        processed_file_path = get_processed_file_path(file_id)
+        cache_key = _processed_cache_key(file_id)
+    except OSError:
+        return None
+    content_hash = _processed_hashes.get(cache_key)
+    if content_hash is None:
+        digest = hashlib.sha256()
+        with open(processed_file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        content_hash = digest.hexdigest()
+        _processed_hashes.put(cache_key, content_hash)
+    return content_hash
+
+
+def _get_sidecar_file_path(file_id, suffix, extension=".parquet"):
+    return os.path.join(
+        current_app.config["PROCESSED_FOLDER"],
+        f"{get_processed_id(file_id)}{suffix}{extension}",
+    )
+
+
+def _save_sidecar(obj, file_id: str, suffix: str):
+    temp_path = ""
+    try:
+        sidecar_file_path = _get_sidecar_file_path(file_id, suffix)
+        os.makedirs(os.path.dirname(sidecar_file_path), exist_ok=True)
+        temp_path = _temp_path(sidecar_file_path)
+        obj.to_parquet(temp_path)
+        os.replace(temp_path, sidecar_file_path)
+        temp_path = ""
+        cache_id = get_processed_id(file_id)
+        _sidecar_cache.discard_where(
+            lambda key: key[0] == cache_id and key[1] == suffix
+        )
+        return sidecar_file_path, None
+    except Exception as e:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+        return "", str(e)
+
+
+def _load_sidecar(file_id: str, suffix: str, reader, extension=".parquet"):
+    try:
+        sidecar_file_path = _get_sidecar_file_path(file_id, suffix, extension)
+        cache_key = (
+            get_processed_id(file_id),
+            suffix,
+            os.stat(sidecar_file_path).st_mtime_ns,
+        )
+    except OSError:
+        return None
+    obj = _sidecar_cache.get(cache_key)
+    if obj is None:
+        try:
+            obj = reader(sidecar_file_path)
+        except Exception:
+            return None
+        if obj is None:
+            return None
+        _sidecar_cache.discard_where(
+            lambda key: key[0] == cache_key[0] and key[1] == suffix
+        )
+        _sidecar_cache.put(cache_key, obj)
+    # Só vale para o parquet processado a partir do qual foi gerado.
+    if obj.meta.get("source_hash") != get_processed_file_hash(file_id):
+        return None
+    return obj
+
+
+def get_cube_file_path(file_id):
+    return _get_sidecar_file_path(file_id, ".cube")
+
+
+def save_aggregate_cube(cube, file_id: str):
+    return _save_sidecar(cube, file_id, ".cube")
+
+
+def load_aggregate_cube(file_id: str):
+    from utils.analysis.cube import AggregateCube
+
+    return _load_sidecar(file_id, ".cube", AggregateCube.read_parquet)
+
+
+def load_value_index(file_id: str):
+    from utils.value_index import ValueIndex
+
+    return _load_sidecar(file_id, ".values", ValueIndex.read_parquet)
+
+
+def get_model_file_path(file_id):
+    return _get_sidecar_file_path(file_id, ".model", ".joblib")
+
+
+def save_delivery_model(predictor, file_id: str):
+    temp_path = ""
+    try:
+        model_file_path = get_model_file_path(file_id)
+        os.makedirs(os.path.dirname(model_file_path), exist_ok=True)
+        # Grava ao lado e troca de uma vez: o /predict pode estar lendo o anterior.
+        temp_path = _temp_path(model_file_path)
+        predictor.save(temp_path)
+        os.replace(temp_path, model_file_path)
+        temp_path = ""
+        cache_id = get_processed_id(file_id)
+        _sidecar_cache.discard_where(
+            lambda key: key[0] == cache_id and key[1] == ".model"
+        )
+        return model_file_path, None
+    except Exception as e:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+        return "", str(e)
+
+
+def load_delivery_model(file_id: str):
+    from utils.predictor import DeliveryPredictor
+
+    return _load_sidecar(file_id, ".model", DeliveryPredictor.load, ".joblib")
+
+
 def clean_old_files(max_age_seconds=3600):
     now = time.time()
+    processed_folder = current_app.config.get("PROCESSED_FOLDER")
     folders = [
         current_app.config.get("UPLOAD_FOLDER"),
-        current_app.config.get("PROCESSED_FOLDER")
+        current_app.config.get("PROCESSED_FOLDER"),
     ]
     for folder in folders:
         if not folder or not os.path.exists(folder):
             continue
-        for filename in os.listdir(folder):
+        filenames = os.listdir(folder)
+        # Conteúdo e resultados compartilhados ficam enquanto algum fileId recente
+        # apontar para eles: o reuso não regrava os arquivos, só o .ref.
+        in_use = set()
+        for filename in filenames:
+            ref_path = os.path.join(folder, filename)
+            if filename.endswith(".ref") and os.path.isfile(ref_path):
+                if now - os.path.getmtime(ref_path) <= max_age_seconds:
+                    target = _read_ref(ref_path)
+                    if target:
+                        in_use.add(target)
+        for filename in filenames:
             file_path = os.path.join(folder, filename)
+            if filename.split(".", 1)[0] in in_use:
+                continue
             if os.path.isfile(file_path):
                 mtime = os.path.getmtime(file_path)
                 if now - mtime > max_age_seconds:
                     try:
                         os.remove(file_path)
                     except Exception:
-                        pass
+                        continue
+                    if folder == processed_folder and filename.endswith(
+                        (".parquet", ".joblib")
+                    ):
+                        file_id = filename.rsplit(".", 1)[0]
+                        for suffix in SIDECAR_SUFFIXES:
+                            file_id = file_id.removesuffix(suffix)
+                        invalidate_processed_cache(file_id)
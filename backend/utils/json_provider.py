@@ -0,0 +1,70 @@
+import datetime
+import decimal
+import math
+import numpy as np
+import pandas as pd
+from typing import Any
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _finite(obj: Any) -> Any:
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(value) for value in obj]
+    return obj
+
+
+def _default(obj: Any) -> Any:
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, pd.Timedelta):
+        return str(obj)
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return _finite(obj.astype(object).where(obj.notna(), None).tolist())
+    if isinstance(obj, np.ndarray):
+        return _finite(obj.tolist())
+    if isinstance(obj, np.generic):
+        return _finite(obj.item())
+    if isinstance(obj, decimal.Decimal):
+        return _finite(float(obj))
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Serializa numpy, pandas e NaN nativamente; usa orjson quando disponível."""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is None:
+            kwargs.setdefault("default", _default)
+            # json.dumps não passa NaN/Infinity pelo default; sem allow_nan,
+            # os não finitos viram null numa segunda passada.
+            try:
+                return super().dumps(obj, allow_nan=False, **kwargs)
+            except ValueError:
+                return super().dumps(_finite(obj), **kwargs)
+
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option).decode()
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
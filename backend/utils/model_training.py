@@ -0,0 +1,82 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_training_executor = None
+_training_executor_lock = threading.Lock()
+_training_jobs_lock = threading.Lock()
+# Chave: (file_id, hash do parquet processado) — uma nova análise treina de novo.
+_training_jobs: Dict[Tuple[str, str], Future] = {}
+
+
+def _get_training_executor() -> ThreadPoolExecutor:
+    global _training_executor
+    with _training_executor_lock:
+        if _training_executor is None:
+            # Um treino por vez: o Random Forest já usa todos os núcleos.
+            _training_executor = ThreadPoolExecutor(max_workers=1)
+        return _training_executor
+
+
+def _train_model(app, file_id: str, source_hash: str) -> None:
+    from utils.file_utils import (
+        get_processed_file_hash,
+        load_processed_dataframe,
+        save_delivery_model,
+    )
+    from utils.predictor import DeliveryPredictor
+
+    with app.app_context():
+        # O fileId pode ter sido apontado para outro resultado enquanto o treino
+        # esperava na fila; o modelo não pode ir para o derivado errado.
+        if get_processed_file_hash(file_id) != source_hash:
+            return
+        df, load_error = load_processed_dataframe(file_id)
+        if load_error:
+            raise RuntimeError(load_error)
+        predictor = DeliveryPredictor()
+        predictor.train(df)
+        predictor.meta["source_hash"] = source_hash
+        if get_processed_file_hash(file_id) != source_hash:
+            return
+        _, save_error = save_delivery_model(predictor, file_id)
+        if save_error:
+            raise RuntimeError(save_error)
+
+
+def _log_failure(file_id: str, future: Future) -> None:
+    error = future.exception()
+    if error is not None:
+        logger.warning(f"Erro ao treinar o modelo de {file_id}: {str(error)}")
+
+
+def schedule_model_training(app, file_id: str, source_hash: str) -> Future:
+    """Agenda o treino do modelo do arquivo, se ainda não houve um para este hash.
+
+    Um treino que falhou não é repetido até o parquet processado mudar.
+    """
+    key = (file_id, source_hash)
+    with _training_jobs_lock:
+        future = _training_jobs.get(key)
+        if future is None:
+            for stale in [k for k in _training_jobs if k[0] == file_id]:
+                del _training_jobs[stale]
+            future = _get_training_executor().submit(
+                _train_model, app, file_id, source_hash
+            )
+            future.add_done_callback(lambda done: _log_failure(file_id, done))
+            _training_jobs[key] = future
+    return future
+
+
+def model_training_status(file_id: str, source_hash: str) -> Optional[str]:
+    with _training_jobs_lock:
+        future = _training_jobs.get((file_id, source_hash))
+    if future is None:
+        return None
+    if not future.done():
+        return "training"
+    return "failed" if future.exception() else "ready"
@@ -1,61 +1,216 @@
+import joblib
+import logging
 import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import LabelEncoder
 from sklearn.model_selection import train_test_split
 from statsmodels.formula.api import glm as glm_sm
+from typing import List, Optional
+from config import (
+    PREDICT_BATCH_MASK_CACHE_BYTES,
+    PREDICTOR_MAX_CATEGORIES,
+    PREDICTOR_MAX_DEPTH,
+    PREDICTOR_N_ESTIMATORS,
+    PREDICTOR_TRAIN_MAX_ROWS,
+)
+from utils.cache import LRUCache
+from utils.data_prep import factor_equals
+
+logger = logging.getLogger(__name__)
 
 
 class DeliveryPredictor:
+    """Random Forest treinado uma vez por arquivo processado.
+
+    Fatores viram códigos pelas categorias vistas no treino (em minúsculas);
+    valores desconhecidos ou ausentes recebem -1. A data entra como ano, mês
+    e dia do ano, e colunas numéricas ausentes na consulta usam a mediana do treino.
+    """
+
     def __init__(self):
-        self.model = RandomForestRegressor(n_estimators=100)
+        self.model = RandomForestRegressor(
+            n_estimators=PREDICTOR_N_ESTIMATORS,
+            max_depth=PREDICTOR_MAX_DEPTH,
+            min_samples_leaf=5,
+            n_jobs=-1,
+            random_state=0,
+        )
         self.label_encoders = {}
+        self.numeric_medians = {}
+        self.feature_columns = []
+        self.meta = {}
         self.trained = False
 
     def prepare_features(self, df, categorical_columns):
-        X = df.copy()
-
-        for col in categorical_columns:
-            if col not in self.label_encoders:
-                self.label_encoders[col] = LabelEncoder()
-
-            X[col] = self.label_encoders[col].fit_transform(X[col].astype(str))
-
-        return X
+        dates = pd.to_datetime(df["actual_date"]).dt.tz_localize(None)
+        X = {
+            "year": dates.dt.year,
+            "month": dates.dt.month,
+            "dayofyear": dates.dt.dayofyear,
+        }
 
-    def train(self, df, feature_columns, target_column="delay"):
-        X = self.prepare_features(
-            df[feature_columns],
-            [col for col in feature_columns if df[col].dtype == "object"],
+        for col in self.feature_columns:
+            if col in categorical_columns:
+                if col not in self.label_encoders:
+                    self.label_encoders[col] = LabelEncoder().fit(
+                        df[col].dropna().astype(str).str.lower()
+                    )
+                labels = df[col].astype(str).str.lower().where(df[col].notna())
+                X[col] = pd.Categorical(
+                    labels, categories=self.label_encoders[col].classes_
+                ).codes
+            else:
+                values = pd.to_numeric(df[col], errors="coerce")
+                if col not in self.numeric_medians:
+                    median = values.median()
+                    self.numeric_medians[col] = (
+                        0.0 if pd.isna(median) else float(median)
+                    )
+                X[col] = values.fillna(self.numeric_medians[col])
+
+        return pd.DataFrame(X, index=df.index)
+
+    def _categorical_columns(self, df):
+        return [
+            col
+            for col in self.feature_columns
+            if col in self.label_encoders
+            or df[col].dtype == "object"
+            or isinstance(df[col].dtype, pd.CategoricalDtype)
+        ]
+
+    def train(self, df, feature_columns=None, target_column="delay_days"):
+        df = df.dropna(subset=["actual_date", target_column])
+        if len(df) < 10:
+            raise ValueError("Poucos dados para treinar o modelo")
+        if len(df) > PREDICTOR_TRAIN_MAX_ROWS:
+            df = df.sample(PREDICTOR_TRAIN_MAX_ROWS, random_state=0)
+
+        if feature_columns is None:
+            feature_columns = []
+            for col in df.columns:
+                if col in ["estimated_date", "actual_date", target_column]:
+                    continue
+                series = df[col]
+                if series.dtype == "object" or isinstance(
+                    series.dtype, pd.CategoricalDtype
+                ):
+                    if series.nunique() <= PREDICTOR_MAX_CATEGORIES:
+                        feature_columns.append(col)
+                elif pd.api.types.is_numeric_dtype(
+                    series
+                ) and not pd.api.types.is_bool_dtype(series):
+                    feature_columns.append(col)
+        self.feature_columns = list(feature_columns)
+
+        X = self.prepare_features(df, self._categorical_columns(df))
+        y = pd.to_numeric(df[target_column], errors="coerce")
+
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=0.2, random_state=0
         )
-        y = df[target_column]
-
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2)
         self.model.fit(X_train, y_train)
         self.trained = True
 
-        return self.model.score(X_test, y_test)
-
-    def predict(self, features):
+        score = float(self.model.score(X_test, y_test))
+        self.meta.update({"score": score, "training_rows": len(df)})
+        return score
+
+    def _query_frame(self, queries):
+        rows = []
+        for query in queries:
+            row = {"actual_date": query.get("actual_date")}
+            for col in self.feature_columns:
+                value = query.get(col)
+                if value in [None, "", "null"] and col in self.numeric_medians:
+                    # Faixa _min/_max: usa o ponto médio (ou o limite informado).
+                    bounds = pd.to_numeric(
+                        pd.Series([query.get(f"{col}_min"), query.get(f"{col}_max")]),
+                        errors="coerce",
+                    ).dropna()
+                    value = bounds.mean() if len(bounds) else None
+                row[col] = None if value in [None, "", "null"] else value
+            rows.append(row)
+        frame = pd.DataFrame(rows, columns=["actual_date"] + self.feature_columns)
+        frame["actual_date"] = pd.to_datetime(frame["actual_date"], errors="coerce")
+        return frame
+
+    def predict_many(self, queries):
+        """Previsões vetorizadas para uma lista de consultas, na mesma ordem."""
         if not self.trained:
             raise Exception("Modelo não treinado")
 
-        X = self.prepare_features(
-            pd.DataFrame([features]),
-            [col for col in features.keys() if isinstance(features[col], str)],
+        frame = self._query_frame(queries)
+        valid = frame["actual_date"].notna().to_numpy()
+        results = [
+            {
+                "error": "Data da consulta inválida ou ausente",
+                "predictedDelay": 0,
+                "confidenceInterval": [0, 0],
+                "reliability": 0,
+                "similarCases": 0,
+                "model_used": "error",
+            }
+            for _ in queries
+        ]
+        if not valid.any():
+            return results
+
+        frame = frame[valid]
+        X = self.prepare_features(frame, list(self.label_encoders)).to_numpy(
+            dtype=np.float32
         )
-
-        prediction = self.model.predict(X)[0]
-        confidence = (
-            self.model.predict_proba(X)
-            if hasattr(self.model, "predict_proba")
-            else None
+        # Validação feita uma vez; cada árvore é percorrida direto (tree_.predict).
+        trees = np.stack(
+            [tree.tree_.predict(X)[:, 0] for tree in self.model.estimators_]
         )
+        predictions = trees.mean(axis=0)
+        lower, upper = np.percentile(trees, [10, 90], axis=0)
+        std_dev = trees.std(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            consistency = np.where(
+                np.abs(predictions) > 0,
+                1 / (1 + std_dev / np.abs(predictions)),
+                np.where(std_dev == 0, 1.0, 0.1),
+            )
+        reliability = 0.5 * consistency + 0.5 * max(self.meta.get("score", 0.0), 0.0)
 
-        return {
-            "prediction": float(prediction),
-            "confidence": float(confidence[0].max()) if confidence is not None else 0.8,
+        unknown = {
+            col: (X[:, 3 + self.feature_columns.index(col)] < 0)
+            for col in self.label_encoders
         }
+        for k, i in enumerate(np.flatnonzero(valid)):
+            result = {
+                "predictedDelay": float(predictions[k]),
+                "confidenceInterval": [float(lower[k]), float(upper[k])],
+                "reliability": float(reliability[k]),
+                # O modelo não filtra casos: todas as linhas de treino contam igual.
+                "similarCases": None,
+                "model_used": "random_forest",
+                "query_date": frame["actual_date"].iloc[k].isoformat(),
+                "trainingRows": self.meta.get("training_rows", 0),
+            }
+            unknown_cols = [
+                col
+                for col, flags in unknown.items()
+                if flags[k] and queries[i].get(col) not in [None, "", "null"]
+            ]
+            if unknown_cols:
+                result["unknownFactors"] = unknown_cols
+            results[i] = result
+        return results
+
+    def predict(self, features):
+        return self.predict_many([features])[0]
+
+    def save(self, path):
+        joblib.dump(self, path)
+
+    @classmethod
+    def load(cls, path):
+        predictor = joblib.load(path)
+        return predictor if isinstance(predictor, cls) else None
 
 
 def clean_data(df, value_col="delay_days", outlier_z=3):
@@ -95,8 +250,197 @@ def get_glm_forecast(df, value_col="delay_days", features=None):
         return {"error": str(e), "prediction": None, "model": None, "pvalues": None}
 
 
-def predict_delay(df: pd.DataFrame, query: dict, columns: list):
+class PredictionIndex:
+    """Linhas com data, ordenadas por actual_date, prontas para as buscas de predict_delay.
+
+    Fatores viram códigos inteiros com mapa de rótulos em minúsculas, e a janela
+    de datas de uma consulta vira intervalos de searchsorted sobre as datas em int64.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        dates = pd.to_datetime(df["actual_date"]).dt.tz_localize(None).to_numpy()
+        valid = np.flatnonzero(~pd.isnull(dates))
+        order = np.argsort(dates[valid], kind="stable")
+        self.positions = valid[order]
+        self.columns = set(df.columns)
+
+        sorted_dates = pd.DatetimeIndex(dates[self.positions])
+        self.dates = sorted_dates.asi8
+        self.years = sorted_dates.year.to_numpy()
+        self.months = sorted_dates.month.to_numpy()
+        self.delay = pd.to_numeric(df["delay_days"], errors="coerce").to_numpy(
+            dtype=np.float64
+        )[self.positions]
+
+        # Tudo é copiado na ordem das datas: o índice não segura o DataFrame de
+        # origem, e nbytes conta toda a memória que ele mantém viva.
+        self._factors = {}
+        self._values = {}
+        for col in df.columns:
+            if col == "actual_date":
+                continue
+            factor = self._build_factor(df[col])
+            if factor is not None:
+                self._factors[col] = factor
+            else:
+                self._values[col] = df[col].iloc[self.positions].reset_index(drop=True)
+
+    def _build_factor(self, series: pd.Series):
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            labels = series.cat.categories.astype(str)
+        elif series.dtype == "object":
+            codes, uniques = pd.factorize(series)
+            labels = pd.Index(uniques).astype(str)
+        else:
+            return None
+
+        lookup = {}
+        for code, label in enumerate(labels.str.lower()):
+            lookup.setdefault(label, []).append(code)
+        # Valor numérico de cada rótulo, para os filtros _min/_max; -1 (nulo) é o último.
+        numbers = np.append(
+            pd.to_numeric(pd.Series(labels), errors="coerce").to_numpy(
+                dtype=np.float64
+            ),
+            np.nan,
+        )
+        return (
+            codes[self.positions],
+            {label: np.array(found) for label, found in lookup.items()},
+            numbers,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.positions, self.dates, self.years, self.months, self.delay]
+        for codes, _, numbers in self._factors.values():
+            arrays += [codes, numbers]
+        total = sum(array.nbytes for array in arrays)
+        total += sum(
+            series.memory_usage(index=False, deep=True)
+            for series in self._values.values()
+        )
+        return int(total)
+
+    def _numeric_values(self, col: str, rows) -> np.ndarray:
+        if col == "actual_date":
+            return self.dates[rows].astype(np.float64)
+        factor = self._factors.get(col)
+        if factor is not None:
+            codes, _, numbers = factor
+            return numbers[codes[rows]]
+        return pd.to_numeric(self._values[col].iloc[rows], errors="coerce").to_numpy(
+            dtype=np.float64, na_value=np.nan
+        )
+
+    def _equals(self, col: str, value, rows) -> np.ndarray:
+        factor = self._factors.get(col)
+        if factor is None:
+            series = self._values[col].iloc[rows]
+            return factor_equals(series, value, case_insensitive=True).to_numpy(
+                dtype=bool, na_value=False
+            )
+        codes, lookup, _ = factor
+        targets = lookup.get(str(value).lower())
+        if targets is None:
+            return np.zeros(len(codes[rows]), dtype=bool)
+        return np.isin(codes[rows], targets)
+
+    def _condition(self, col: str, val, rows, equality_only: bool):
+        """Máscara do filtro sobre `rows`; None se o filtro não se aplica."""
+        if not equality_only and (col.endswith("_min") or col.endswith("_max")):
+            base_col = col[:-4]
+            if base_col not in self.columns:
+                return None
+            try:
+                val_num = float(val)
+            except Exception:
+                val_num = val
+            values = self._numeric_values(base_col, rows)
+            return values >= val_num if col.endswith("_min") else values <= val_num
+        if col in self.columns:
+            return self._equals(col, val, rows)
+        return None
+
+    def mask(self, filters: dict, equality_only: bool = False) -> np.ndarray:
+        """Filtros aplicados a todas as linhas, para reaproveitar entre consultas."""
+        result = np.ones(len(self.dates), dtype=bool)
+        for col, val in filters.items():
+            if not result.any():
+                break
+            condition = self._condition(col, val, slice(None), equality_only)
+            if condition is not None:
+                result &= condition
+        return result
+
+    def candidates(self, query_date: pd.Timestamp) -> np.ndarray:
+        """Mesmo mês de qualquer ano ou até 30 dias da data da consulta."""
+        if len(self.dates) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        window = pd.Timedelta(days=30).value
+        ranges = [
+            (
+                np.searchsorted(self.dates, query_date.value - window, side="left"),
+                np.searchsorted(self.dates, query_date.value + window, side="right"),
+            )
+        ]
+        for year in range(int(self.years[0]), int(self.years[-1]) + 1):
+            month_start = pd.Timestamp(year=year, month=query_date.month, day=1)
+            month_end = month_start + pd.offsets.MonthBegin()
+            ranges.append(
+                tuple(
+                    np.searchsorted(
+                        self.dates, [month_start.value, month_end.value], side="left"
+                    )
+                )
+            )
+
+        # Intervalos ordenados e unidos: as posições saem crescentes e sem repetição.
+        merged = []
+        for lo, hi in sorted((lo, hi) for lo, hi in ranges if hi > lo):
+            if merged and lo <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], hi)
+            else:
+                merged.append([lo, hi])
+        if not merged:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(lo, hi) for lo, hi in merged])
+
+    def select(
+        self,
+        query_date: pd.Timestamp,
+        filters: dict,
+        equality_only: bool = False,
+        masks: Optional[LRUCache] = None,
+    ) -> np.ndarray:
+        rows = self.candidates(query_date)
+        if masks is not None:
+            key = (_filter_key(filters), equality_only)
+            mask = masks.get(key)
+            if mask is None:
+                try:
+                    mask = self.mask(filters, equality_only)
+                except Exception:
+                    # Filtro inválido: a busca sequencial abaixo reproduz o erro.
+                    mask = False
+                masks.put(key, mask)
+            if mask is not False:
+                return rows[mask[rows]]
+
+        for col, val in filters.items():
+            if len(rows) == 0:
+                break
+            condition = self._condition(col, val, rows, equality_only)
+            if condition is not None:
+                rows = rows[condition]
+        return rows
+
+
+def predict_delay(data, query: dict, columns: list, masks: Optional[LRUCache] = None):
     try:
+        index = data if isinstance(data, PredictionIndex) else PredictionIndex(data)
         query_date = pd.to_datetime(query.get("actual_date")).tz_localize(None)
 
         filters = {
@@ -105,74 +449,19 @@ def predict_delay(df: pd.DataFrame, query: dict, columns: list):
             if k not in ["actual_date"] and v not in [None, "", "null"]
         }
 
-        filtered = df.copy()
-        filtered["actual_date"] = pd.to_datetime(
-            filtered["actual_date"]
-        ).dt.tz_localize(None)
+        rows = index.select(query_date, filters, masks=masks)
 
-        for col, val in filters.items():
-            if col.endswith("_min"):
-                base_col = col[:-4]
-                if base_col in filtered.columns:
-                    filtered[base_col] = pd.to_numeric(
-                        filtered[base_col], errors="coerce"
-                    )
-                    try:
-                        val_num = float(val)
-                    except Exception:
-                        val_num = val
-                    filtered = filtered[filtered[base_col] >= val_num]
-            elif col.endswith("_max"):
-                base_col = col[:-4]
-                if base_col in filtered.columns:
-                    filtered[base_col] = pd.to_numeric(
-                        filtered[base_col], errors="coerce"
-                    )
-                    try:
-                        val_num = float(val)
-                    except Exception:
-                        val_num = val
-                    filtered = filtered[filtered[base_col] <= val_num]
-            elif col in filtered.columns:
-                if filtered[col].dtype == "object":
-                    filtered = filtered[
-                        filtered[col].astype(str).str.lower() == str(val).lower()
-                    ]
-                else:
-                    filtered = filtered[filtered[col] == val]
-
-        if "actual_date" in filtered.columns and query_date is not None:
-            filtered["actual_date"] = pd.to_datetime(filtered["actual_date"])
-            same_month = filtered[filtered["actual_date"].dt.month == query_date.month]
-            window = filtered[(filtered["actual_date"] >= (query_date - pd.Timedelta(days=30))) & (filtered["actual_date"] <= (query_date + pd.Timedelta(days=30)))]
-            filtered = pd.concat([same_month, window]).drop_duplicates()
-
-        if len(filtered) == 0:
+        if len(rows) == 0:
             for col in ["Product Group", "Shipment Mode", "Country"]:
                 if col in filters and len(filters) > 1:
                     del filters[col]
-                    filtered = df.copy()
-                    filtered["actual_date"] = pd.to_datetime(
-                        filtered["actual_date"]
-                    ).dt.tz_localize(None)
-                    for c, v in filters.items():
-                        if c in filtered.columns:
-                            if filtered[c].dtype == "object":
-                                filtered = filtered[
-                                    filtered[c].astype(str).str.lower()
-                                    == str(v).lower()
-                                ]
-                            else:
-                                filtered = filtered[filtered[c] == v]
-                    if "actual_date" in filtered.columns and query_date is not None:
-                        filtered["actual_date"] = pd.to_datetime(filtered["actual_date"])
-                        same_month = filtered[filtered["actual_date"].dt.month == query_date.month]
-                        window = filtered[(filtered["actual_date"] >= (query_date - pd.Timedelta(days=30))) & (filtered["actual_date"] <= (query_date + pd.Timedelta(days=30)))]
-                        filtered = pd.concat([same_month, window]).drop_duplicates()
-                    if len(filtered) > 0:
+                    rows = index.select(
+                        query_date, filters, equality_only=True, masks=masks
+                    )
+                    if len(rows) > 0:
                         break
 
-        if len(filtered) == 0:
+        if len(rows) == 0:
             return {
                 "error": "Nenhum dado histórico encontrado para os critérios fornecidos",
                 "prediction": 0,
@@ -181,44 +470,35 @@ def predict_delay(df: pd.DataFrame, query: dict, columns: list):
                 "model_used": "no_data",
             }
 
-        filtered["date_diff"] = (filtered["actual_date"] - query_date).dt.days.abs()
-        max_diff = filtered["date_diff"].max()
-        min_diff = filtered["date_diff"].min()
+        delay = index.delay[rows]
+        date_diff = np.abs(
+            (index.dates[rows] - query_date.value) // pd.Timedelta(days=1).value
+        )
+        max_diff = date_diff.max()
+        min_diff = date_diff.min()
 
         if max_diff > 0:
-            filtered["weight"] = 1 - (filtered["date_diff"] - min_diff) / (
-                max_diff - min_diff + 1e-6
-            )
+            weight = 1 - (date_diff - min_diff) / (max_diff - min_diff + 1e-6)
         else:
-            filtered["weight"] = 1.0
-
-        avg_delay = np.average(filtered["delay_days"], weights=filtered["weight"])
-
-        data_amount_factor = 1 - np.exp(-0.03 * len(filtered))
+            weight = np.ones(len(rows))
 
-        current_year = query_date.year
-        filtered["year"] = filtered["actual_date"].dt.year
-        filtered["year_diff"] = abs(filtered["year"] - current_year)
+        avg_delay = np.average(delay, weights=weight)
 
-        if filtered["year_diff"].max() > 0:
-            filtered["year_weight"] = 1 - (
-                filtered["year_diff"] / filtered["year_diff"].max()
-            )
-        else:
-            filtered["year_weight"] = 1.0
+        data_amount_factor = 1 - np.exp(-0.03 * len(rows))
 
-        if "weight" in filtered.columns:
-            filtered["combined_weight"] = (filtered["weight"] * 0.7) + (
-                filtered["year_weight"] * 0.3
-            )
+        year_diff = np.abs(index.years[rows] - query_date.year)
+        if year_diff.max() > 0:
+            year_weight = 1 - (year_diff / year_diff.max())
         else:
-            filtered["combined_weight"] = filtered["year_weight"]
+            year_weight = np.ones(len(rows))
 
-        time_proximity = filtered["combined_weight"].mean()
+        combined_weight = (weight * 0.7) + (year_weight * 0.3)
+        time_proximity = combined_weight.mean()
 
-        if len(filtered) > 1:
-            std_dev = filtered["delay_days"].std()
-            mean_abs = abs(filtered["delay_days"].mean())
+        delay_series = pd.Series(delay)
+        if len(rows) > 1:
+            std_dev = delay_series.std()
+            mean_abs = abs(delay_series.mean())
             if mean_abs > 0:
                 consistency = 1 / (1 + (std_dev / mean_abs))
             else:
@@ -232,10 +512,17 @@ def predict_delay(df: pd.DataFrame, query: dict, columns: list):
 
         try:
             query_month = query_date.month
-            filtered["month"] = filtered["actual_date"].dt.month
-            monthly_avg = filtered.groupby("month")["delay_days"].mean()
-            if not monthly_avg.empty and query_month in monthly_avg:
-                monthly_factor = monthly_avg[query_month] / monthly_avg.mean()
+            months = index.months[rows]
+            valid = ~np.isnan(delay)
+            present = np.bincount(months, minlength=13) > 0
+            counts = np.bincount(months[valid], minlength=13)
+            sums = np.bincount(months[valid], weights=delay[valid], minlength=13)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                monthly_avg = np.where(counts > 0, sums / counts, np.nan)
+            if present[query_month]:
+                monthly_factor = monthly_avg[query_month] / np.nanmean(
+                    monthly_avg[present]
+                )
                 avg_delay *= monthly_factor
         except Exception as e:
             logger.warning(f"Erro ao ajustar sazonalidade mensal: {str(e)}")
@@ -248,10 +535,10 @@ def predict_delay(df: pd.DataFrame, query: dict, columns: list):
             "predictedDelay": float(avg_delay),
             "confidenceInterval": confidence_interval,
             "reliability": reliability_percent,
-            "similarCases": len(filtered),
+            "similarCases": len(rows),
             "model_used": "weighted_historical",
             "query_date": query_date.isoformat(),
-            "data_points_used": len(filtered),
+            "data_points_used": len(rows),
         }
 
     except Exception as e:
@@ -266,3 +553,35 @@ def predict_delay(df: pd.DataFrame, query: dict, columns: list):
             "similarCases": 0,
             "model_used": "error",
         }
+
+
+def _filter_key(query: dict):
+    return tuple(
+        sorted(
+            (k, repr(v))
+            for k, v in query.items()
+            if k != "actual_date" and v not in [None, "", "null"]
+        )
+    )
+
+
+def predict_delay_batch(data, queries: List[dict], columns: list) -> List[dict]:
+    """Previsões de várias consultas, na ordem de entrada, sobre um único índice.
+
+    Consultas com a mesma combinação de filtros são avaliadas em sequência e
+    compartilham a máscara calculada sobre o histórico inteiro.
+    """
+    index = data if isinstance(data, PredictionIndex) else PredictionIndex(data)
+    masks = LRUCache(
+        max_bytes=PREDICT_BATCH_MASK_CACHE_BYTES,
+        sizeof=lambda mask: getattr(mask, "nbytes", 0),
+    )
+    keys = [(_filter_key(query), repr(query.get("actual_date"))) for query in queries]
+    # Consultas idênticas (mesmos filtros e data) reaproveitam o resultado.
+    computed = {}
+    results = [None] * len(queries)
+    for i in sorted(range(len(queries)), key=lambda i: keys[i]):
+        if keys[i] not in computed:
+            computed[keys[i]] = predict_delay(index, queries[i], columns, masks=masks)
+        results[i] = dict(computed[keys[i]])
+    return results
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+SAMPLING_STRATEGIES = ("uniform", "stratified", "lttb", "minmax")
+
+
+def _time_axis(df: pd.DataFrame, x_col: str) -> np.ndarray:
+    x = pd.to_datetime(df[x_col]).to_numpy().astype("datetime64[ns]").astype(np.int64)
+    # Em dias a partir do primeiro ponto, para as áreas do LTTB não perderem precisão.
+    return (x - x.min()) / 86_400e9
+
+
+def _uniform(df: pd.DataFrame, limit: int, rng: np.random.Generator) -> np.ndarray:
+    return rng.choice(len(df), size=limit, replace=False)
+
+
+def _stratified(
+    df: pd.DataFrame, limit: int, rng: np.random.Generator, strata_col: str
+) -> np.ndarray:
+    codes, uniques = pd.factorize(df[strata_col], use_na_sentinel=False)
+    counts = np.bincount(codes, minlength=len(uniques))
+    # Cota proporcional ao tamanho do grupo, com ao menos um ponto por grupo.
+    quotas = np.maximum(np.floor(limit * counts / len(df)), 1).astype(np.int64)
+
+    order = rng.permutation(len(df))
+    shuffled_codes = codes[order]
+    rank = pd.Series(shuffled_codes).groupby(shuffled_codes).cumcount().to_numpy()
+    within_quota = rank < quotas[shuffled_codes]
+
+    chosen = order[within_quota]
+    if len(chosen) > limit:
+        # Mais grupos que pontos: fica a primeira amostra de cada grupo, em rodízio.
+        chosen = chosen[np.argsort(rank[within_quota], kind="stable")[:limit]]
+    elif len(chosen) < limit:
+        chosen = np.concatenate([chosen, order[~within_quota][: limit - len(chosen)]])
+    return chosen
+
+
+def _minmax(df: pd.DataFrame, limit: int, x_col: str, y_col: str) -> np.ndarray:
+    x = _time_axis(df, x_col)
+    buckets = max(limit // 2, 1)
+    edges = np.linspace(x.min(), x.max(), buckets + 1)
+    bucket = np.clip(np.searchsorted(edges, x, side="right") - 1, 0, buckets - 1)
+
+    y = pd.Series(df[y_col].to_numpy(dtype=np.float64))
+    grouped = y.groupby(bucket)
+    return np.union1d(grouped.idxmin().to_numpy(), grouped.idxmax().to_numpy())
+
+
+def _lttb(df: pd.DataFrame, limit: int, x_col: str, y_col: str) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets sobre (actual_date, delay_days)."""
+    order = np.argsort(_time_axis(df, x_col), kind="stable")
+    x = _time_axis(df, x_col)[order]
+    y = df[y_col].to_numpy(dtype=np.float64)[order]
+    n = len(x)
+    if limit < 3:
+        return order[np.linspace(0, n - 1, limit).astype(np.int64)]
+
+    every = (n - 2) / (limit - 2)
+    selected = np.empty(limit, dtype=np.int64)
+    selected[0] = 0
+    a = 0
+    for i in range(limit - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_start = end
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return order[selected]
+
+
+def sample_rows(
+    df: pd.DataFrame,
+    limit: int,
+    strategy: str = "uniform",
+    seed: Optional[int] = None,
+    strata_col: Optional[str] = None,
+    x_col: str = "actual_date",
+    y_col: str = "delay_days",
+) -> pd.DataFrame:
+    """Reduz o DataFrame a no máximo `limit` linhas, preservando a ordem original."""
+    if strategy not in SAMPLING_STRATEGIES:
+        raise ValueError(f"Estratégia de amostragem inválida: {strategy}")
+    if len(df) <= limit:
+        return df
+    if limit <= 0:
+        return df.iloc[:0]
+
+    rng = np.random.default_rng(seed)
+    if strategy == "stratified" and strata_col in df.columns:
+        positions = _stratified(df, limit, rng, strata_col)
+    elif strategy == "minmax":
+        positions = _minmax(df, limit, x_col, y_col)
+    elif strategy == "lttb":
+        positions = _lttb(df, limit, x_col, y_col)
+    else:
+        positions = _uniform(df, limit, rng)
+    return df.iloc[np.sort(positions)]
@@ -0,0 +1,193 @@
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import Dict, Any, Optional, List, Tuple
+
+VALUE_INDEX_VERSION = 2
+VALUE_INDEX_METADATA_KEY = b"paic.value_index"
+NON_FACTOR_COLS = ["estimated_date", "actual_date", "delay_days"]
+# Acima disso, a coluna guarda só o total por valor e consultas com período
+# voltam a varrer o parquet.
+VALUE_INDEX_MAX_DATED_ROWS = 200000
+
+
+def rank_counts(counts: pd.Series) -> pd.Series:
+    """Do mais para o menos frequente; empates pela ordem dos próprios valores."""
+    counts = counts[counts > 0]
+    if isinstance(counts.index, pd.CategoricalIndex):
+        counts.index = counts.index.astype(counts.index.categories.dtype)
+    return counts.sort_index(kind="stable").sort_values(ascending=False, kind="stable")
+
+
+def _decode_values(values: pd.Series, dtype: str) -> pd.Index:
+    """Volta os valores gravados como texto ao tipo da coluna no parquet processado."""
+    if dtype == "numeric":
+        return pd.Index(pd.to_numeric(values))
+    if dtype == "bool":
+        return pd.Index(values == "True", dtype=bool)
+    if dtype == "datetime":
+        return pd.DatetimeIndex(pd.to_datetime(values, format="ISO8601"))
+    return pd.Index(values, dtype=object)
+
+
+class ValueIndex:
+    """Contagem de cada valor distinto por actual_date, coluna a coluna."""
+
+    def __init__(self, frame: pd.DataFrame, meta: Dict[str, Any]):
+        self.frame = frame
+        self.meta = meta
+        self._columns = {}
+        self._totals = {}
+        for column, rows in frame.groupby("column", observed=True, sort=False):
+            codes, uniques = pd.factorize(rows["value"])
+            values = _decode_values(pd.Series(uniques), meta["dtypes"][column])
+            count = rows["count"].to_numpy(dtype=np.int64)
+            self._columns[column] = (
+                codes,
+                rows["actual_date"].to_numpy(dtype="datetime64[ns]"),
+                count,
+                values,
+            )
+            totals = np.bincount(codes, weights=count, minlength=len(values))
+            self._totals[column] = rank_counts(
+                pd.Series(totals.astype(np.int64), index=values)
+            )
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.meta["dtypes"])
+
+    def lookup(
+        self,
+        column: str,
+        data_inicio: Optional[str] = None,
+        data_fim: Optional[str] = None,
+    ) -> Optional[pd.Series]:
+        """Contagem por valor da coluna no período, na ordem de rank_counts.
+
+        Retorna None se a coluna não estiver no índice, ou se houver período e a
+        coluna só tiver os totais (mais de VALUE_INDEX_MAX_DATED_ROWS pares).
+        """
+        totals = self._totals.get(column)
+        if totals is None or not (data_inicio or data_fim):
+            return totals
+        if column not in self.meta["dated"]:
+            return None
+
+        try:
+            start = pd.Timestamp(data_inicio) if data_inicio else None
+            end = pd.Timestamp(data_fim) if data_fim else None
+        except (TypeError, ValueError):
+            return None
+
+        codes, dates, count, values = self._columns[column]
+        # Mesmo filtro de _apply_row_filters: datas nulas ficam de fora.
+        inside = ~np.isnat(dates)
+        if start is not None:
+            inside &= dates >= start.to_datetime64()
+        if end is not None:
+            inside &= dates <= end.to_datetime64()
+        totals = np.bincount(
+            codes[inside], weights=count[inside], minlength=len(values)
+        )
+        return rank_counts(pd.Series(totals.astype(np.int64), index=values))
+
+    def to_parquet(self, path: str) -> None:
+        table = pa.Table.from_pandas(self.frame, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[VALUE_INDEX_METADATA_KEY] = json.dumps(self.meta).encode()
+        pq.write_table(table.replace_schema_metadata(metadata), path)
+
+    @classmethod
+    def read_parquet(cls, path: str) -> Optional["ValueIndex"]:
+        table = pq.read_table(path)
+        raw_meta = (table.schema.metadata or {}).get(VALUE_INDEX_METADATA_KEY)
+        if raw_meta is None:
+            return None
+        meta = json.loads(raw_meta)
+        if meta.get("version") != VALUE_INDEX_VERSION:
+            return None
+        return cls(table.to_pandas(), meta)
+
+
+def select_values(
+    counts: pd.Series, prefix: Optional[str] = None, top_k: Optional[int] = None
+) -> Tuple[List[Any], int]:
+    """Filtra por prefixo (sem diferenciar maiúsculas) e corta nos top_k mais frequentes."""
+    if prefix:
+        labels = pd.Series(counts.index.astype(str), index=counts.index)
+        counts = counts[labels.str.lower().str.startswith(prefix.lower()).to_numpy()]
+    total = len(counts)
+    if top_k is not None:
+        counts = counts.head(top_k)
+    return counts.index.tolist(), total
+
+
+def _value_dtype(series: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(series):
+        return "bool"
+    if pd.api.types.is_numeric_dtype(series):
+        return "numeric"
+    if pd.api.types.is_datetime64_dtype(series):
+        return "datetime"
+    return "text"
+
+
+def build_value_index(
+    df: pd.DataFrame, source_hash: Optional[str] = None
+) -> ValueIndex:
+    if "actual_date" in df.columns:
+        actual_date = pd.to_datetime(df["actual_date"], errors="coerce").to_numpy()
+    else:
+        actual_date = np.full(len(df), np.datetime64("NaT", "ns"))
+
+    frames = []
+    dtypes = {}
+    dated = []
+    for col in df.columns:
+        if col in NON_FACTOR_COLS:
+            continue
+        series = df[col]
+        dtypes[col] = _value_dtype(series)
+
+        codes, uniques = pd.factorize(series)
+        mask = codes >= 0
+        pairs = pd.DataFrame({"code": codes[mask], "actual_date": actual_date[mask]})
+        counts = pairs.groupby(["code", "actual_date"], dropna=False).size()
+        if len(counts) <= VALUE_INDEX_MAX_DATED_ROWS:
+            dated.append(col)
+        else:
+            counts = pairs.groupby("code").size()
+            counts.index = pd.MultiIndex.from_arrays(
+                [counts.index, np.full(len(counts), np.datetime64("NaT", "ns"))],
+                names=["code", "actual_date"],
+            )
+        counts = counts.reset_index(name="count")
+        labels = pd.Series(uniques).astype(str).to_numpy(dtype=object)
+        frames.append(
+            pd.DataFrame(
+                {
+                    "column": col,
+                    "value": labels[counts["code"].to_numpy()],
+                    "actual_date": counts["actual_date"].to_numpy(
+                        dtype="datetime64[ns]"
+                    ),
+                    "count": counts["count"].to_numpy(dtype=np.int64),
+                }
+            )
+        )
+
+    frame = pd.concat(
+        frames or [pd.DataFrame(columns=["column", "value", "actual_date", "count"])],
+        ignore_index=True,
+    )
+    frame["column"] = frame["column"].astype("category")
+    meta = {
+        "version": VALUE_INDEX_VERSION,
+        "source_hash": source_hash,
+        "dtypes": dtypes,
+        "dated": dated,
+    }
+    return ValueIndex(frame, meta)
@@ -74,7 +74,7 @@ const AdvancedParetoChart: React.FC<AdvancedParetoChartProps> = ({
   useEffect(() => {
     if (!safeFileId) return;
     api
-      .post("/scatter-data", { fileId: safeFileId })
+      .post("/scatter-data", { fileId: safeFileId, limit: 0 })
       .then((res) => {
         const colNames = (res.data.columns || []).filter((name: string) => {
           const column = columns.find((col) => col.name === name);
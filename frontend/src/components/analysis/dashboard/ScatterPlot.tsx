@@ -36,7 +36,7 @@ const ScatterPlot: React.FC = () => {
 
   useEffect(() => {
     if (fileInfo?.name) {
-      api.post('/scatter-data', { fileId: fileInfo.fileId })
+      api.post('/scatter-data', { fileId: fileInfo.fileId, limit: 0 })
         .then(res => {
           setAvailableColumns((res.data.columns || []).filter((name: string) => name !== 'actual_date' && name !== 'delay_days' && name !== 'estimated_date'));
           setMinDate(res.data.min_date || '');
@@ -245,7 +245,7 @@ export const DataProvider: React.FC<DataProviderProps> = ({ children }) => {
           setCurrentPage(1);
 
           let updatedColumns = result.columns.map((col) => {
-            const role = autoRoleMap[col.name];
+            const role = autoRoleMap[col.name] ?? col.suggestedRole ?? undefined;
             return {
               ...col,
               role,
@@ -291,7 +291,7 @@ export const DataProvider: React.FC<DataProviderProps> = ({ children }) => {
           setCurrentPage(1);
 
           let updatedColumns = result.columns.map((col) => {
-            const role = autoRoleMap[col.name];
+            const role = autoRoleMap[col.name] ?? col.suggestedRole ?? undefined;
             return {
               ...col,
               role,
@@ -409,7 +409,6 @@ export const DataProvider: React.FC<DataProviderProps> = ({ children }) => {
       }
 
       const requestPayload = {
-        dataset: rawData,
         columns: selectedColumns.map((col) => ({
           name: col.name,
           label: col.label,
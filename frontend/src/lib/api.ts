@@ -68,6 +68,8 @@ export interface ParseFileResponse {
     name: string;
     label: string;
     type: "date" | "number" | "string" | "boolean";
+    suggestedRole: "estimatedDate" | "actualDate" | "factor" | "delay" | null;
+    confidence: number;
   }[];
   chunked: boolean;
 }
@@ -5,6 +5,8 @@ export interface DataColumn {
   selected: boolean;
   isNumeric?: boolean;
   role?: "estimatedDate" | "actualDate" | "factor" | "delay";
+  suggestedRole?: "estimatedDate" | "actualDate" | "factor" | "delay" | null;
+  confidence?: number;
 }
 
 export interface DataRow {